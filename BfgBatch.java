@@ -0,0 +1,59 @@
+import java.io.File;
+
+/**
+ * Runs BFG with the same --delete-files filter on several repositories within
+ * a single JVM, so that JVM startup and JIT warmup are paid once.
+ *
+ * Usage (Java 11 or later):
+ *
+ *   java -cp $BFG_JAR_PATH BfgBatch.java filter repository...
+ *
+ * A line 'BFG-BATCH-OK repository' is printed once a repository has been
+ * cleaned, i.e. BFG has written its report for this run. Repositories
+ * without such a line have to be cleaned again.
+ */
+public class BfgBatch {
+
+    public static void main(String[] args) {
+        String filter = args[0];
+
+        for (int i = 1; i < args.length; i++) {
+            File repository = new File(args[i]).getAbsoluteFile();
+
+            if (!isGitRepository(repository)) {
+                System.err.println(args[i] + " is not a git repository");
+                continue;
+            }
+
+            // modification times may be truncated to the second
+            long start = System.currentTimeMillis() / 1000 * 1000;
+
+            try {
+                com.madgag.git.bfg.cli.Main.main(
+                        new String[]{"--delete-files", filter, args[i]});
+            } catch (Exception e) {
+                e.printStackTrace();
+                continue;
+            }
+
+            // BFG reports most failures on the console only, whereas each
+            // cleaning adds a report next to the repository
+            File report = new File(repository.getParentFile(),
+                    repository.getName() + ".bfg-report");
+
+            if (report.isDirectory() && report.lastModified() >= start) {
+                System.out.println("BFG-BATCH-OK " + args[i]);
+            } else {
+                System.err.println("No BFG report written for " + args[i]);
+            }
+        }
+    }
+
+    private static boolean isGitRepository(File directory) {
+        // either a working copy or a bare repository
+        return new File(directory, ".git").exists() ||
+                (new File(directory, "HEAD").isFile() &&
+                        new File(directory, "objects").isDirectory());
+    }
+
+}
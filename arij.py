@@ -1,7 +1,35 @@
 #!/usr/bin/env python3
 
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
 from jira import JIRA
 
+import instrumentation
+import utility
+
+# Fields retrieved with each page of search results. They include comments
+# and attachments so that no extra request is required per issue
+ISSUE_FIELDS = ['assignee', 'attachment', 'comment', 'created', 'description',
+                'fixVersions', 'issuetype', 'priority', 'reporter',
+                'resolution', 'summary']
+
+# Compact records holding the data of JIRA resources used by the migration.
+# Unlike resources, they keep neither raw JSON nor a reference to the JIRA
+# session, and they can be pickled cheaply. Issue comments are None when
+# they were not all part of search results.
+IssueRecord = collections.namedtuple(
+    'IssueRecord', ['key', 'title', 'description', 'created',
+                    'reporter_email', 'reporter_name', 'assignee', 'priority',
+                    'resolution', 'type', 'fix_version', 'comments',
+                    'attachments'])
+
+CommentRecord = collections.namedtuple(
+    'CommentRecord', ['id', 'author_email', 'author_name', 'created', 'body'])
+
+AttachmentRecord = collections.namedtuple(
+    'AttachmentRecord', ['id', 'filename', 'size', 'content'])
+
 
 class JiraProject:
     """
@@ -9,129 +37,200 @@ class JiraProject:
     for a given JIRA project
     """
 
-    def __init__(self, jira_url, project_key):
+    def __init__(self, jira_url, project_key, page_size=100, parallelism=4):
+        """
+        :param jira_url: JIRA endpoint used to fetch issues
+        :param project_key: key of the JIRA project to consider
+        :param page_size: number of issues requested per page of search results
+        :param parallelism: number of pages of search results fetched
+                            concurrently
+        """
         self.jira_url = jira_url
         self.jira_client = JIRA(
             options={'server': self.jira_url, 'verify': False},
             validate=False)
         self.project_key = project_key
+        self.page_size = page_size
+        self.parallelism = parallelism
 
+    @instrumentation.instrumented('jira.get_comments')
     def get_comments(self, issue):
-        return self.jira_client.issue(issue.key, expand='comments')
+        """
+        :return: the comments of an issue, fetched from JIRA
+        """
+        comments = self.jira_client.issue(
+            issue.key, expand='comments').fields.comment.comments
+
+        return tuple(self._to_comment_record(c) for c in comments)
 
+    def get_issue_comments(self, issue):
+        """
+        Returns the comments of an issue. They are taken from the search
+        results when available, otherwise the issue is fetched again
+        """
+        if issue.comments is not None:
+            return issue.comments
+
+        return self.get_comments(issue)
+
+    @instrumentation.instrumented('jira.get_project_versions')
     def get_project_versions(self):
         return self.jira_client.project_versions(self.project_key)
 
     @staticmethod
     def get_attachments(issue):
-        try:
-            return issue.fields.attachment
-        except AttributeError:
-            return None
+        return issue.attachments
 
     @staticmethod
     def get_assignee(issue):
-        try:
-            return issue.fields.assignee.name
-        except AttributeError:
-            return None
+        return issue.assignee
 
     @staticmethod
     def get_creation_datetime(issue):
-        return issue.fields.created
+        return issue.created
 
     @staticmethod
     def get_fix_version(issue):
-        try:
-            fix_versions = issue.fields.fixVersions
-
-            if len(fix_versions) > 0:
-                return fix_versions[0].name
-            else:
-                return None
-        except AttributeError:
-            return None
+        return issue.fix_version
 
     @staticmethod
     def get_priority(issue):
-        try:
-            return issue.fields.priority.name
-        except AttributeError:
-            return None
+        return issue.priority
 
     @staticmethod
     def get_resolution(issue):
-        if issue.fields.resolution is not None:
-            return issue.fields.resolution.name
-        else:
-            return None
+        return issue.resolution
 
     @staticmethod
     def get_title(issue):
-        return issue.fields.summary
+        return issue.title
 
     @staticmethod
     def get_type(issue):
-        return issue.fields.issuetype.name
+        return issue.type
 
     @staticmethod
     def is_closed(issue):
-        return issue.fields.resolution is not None
-
-    def get_issues(self):
-        start_index = 0
-        max_nb_results = 100
+        return issue.resolution is not None
+
+    def get_issues(self, fields=ISSUE_FIELDS, expand=None):
+        return list(self.iter_issues(fields, expand))
+
+    def iter_issues(self, fields=ISSUE_FIELDS, expand=None):
+        """
+        Yields the issues of the project in key order, while pages of
+        search results are fetched. Only a bounded number of pages is
+        kept in memory at once
+        """
+        for issues in self._search_pages(fields, expand):
+            yield from map(self._to_issue_record, issues)
+
+    def get_issue_count(self):
+        """
+        :return: the number of issues of the project, which is given with
+                 search results
+        """
+        return self._search(self._get_jql(), 0, 1, 'key', None).total
 
+    def get_attachment_information(self):
         result = []
 
-        # while start_index < max_nb_results:
-        while True:
-            issues = self.jira_client.search_issues(
-                'project=' + self.project_key,
-                startAt=start_index,
-                maxResults=max_nb_results)
+        for issues in self._search_pages('attachment'):
+            for issue in issues:
+                a = self._to_attachment_records(issue.fields)
+                [result.append((issue.key, v)) for v in a]
 
-            result.extend(issues)
+        return result
 
-            if len(issues) == 0 or len(issues) < max_nb_results:
-                break
-            else:
-                start_index += max_nb_results
+    def _search_pages(self, fields, expand=None):
+        """
+        Yields the pages of issues of the project, in key order. The first
+        page gives the total number of issues, remaining pages are then
+        fetched concurrently
+        """
+        jql = self._get_jql()
 
-        return sorted(result, key=lambda issue: int(
-            issue.key[issue.key.index('-') + 1:]))
+        first_page = self._search(jql, 0, self.page_size, fields, expand)
 
-    def get_attachment_information(self):
-        start_index = 0
-        max_nb_results = 100
+        yield first_page
 
-        result = []
+        # the server may serve less results per page than requested
+        page_size = first_page.maxResults
 
-        # while start_index < max_nb_results \
-        while True:
-            issues = self.jira_client.search_issues(
-                'project=' + self.project_key,
-                fields='attachment',
-                startAt=start_index,
-                maxResults=max_nb_results)
+        if len(first_page) == 0 or first_page.total <= page_size:
+            return
 
-            for issue in issues:
-                a = self.get_attachments(issue)
-                if a is not None and len(a) > 0:
-                    [result.append((issue.key, v.id)) for v in a]
+        with ThreadPoolExecutor(max_workers=self.parallelism) as executor:
+            yield from utility.ordered_map(
+                executor,
+                lambda start_index: self._search(
+                    jql, start_index, page_size, fields, expand),
+                range(page_size, first_page.total, page_size),
+                self.parallelism * 2)
 
-            if len(issues) == 0 or len(issues) < max_nb_results:
-                break
-            else:
-                start_index += max_nb_results
+    @staticmethod
+    def _to_issue_record(issue):
+        fields = issue.fields
+        comment = getattr(fields, 'comment', None)
+        comments = None
+
+        if comment is not None and len(comment.comments) >= comment.total:
+            comments = tuple(JiraProject._to_comment_record(c)
+                             for c in comment.comments)
+
+        fix_versions = getattr(fields, 'fixVersions', None)
+
+        return IssueRecord(
+            key=issue.key,
+            title=getattr(fields, 'summary', None),
+            description=getattr(fields, 'description', None),
+            created=getattr(fields, 'created', None),
+            reporter_email=_get_field(fields, 'reporter', 'emailAddress'),
+            reporter_name=_get_field(fields, 'reporter', 'displayName'),
+            assignee=_get_field(fields, 'assignee', 'name'),
+            priority=_get_field(fields, 'priority', 'name'),
+            resolution=_get_field(fields, 'resolution', 'name'),
+            type=_get_field(fields, 'issuetype', 'name'),
+            fix_version=fix_versions[0].name if fix_versions else None,
+            comments=comments,
+            attachments=JiraProject._to_attachment_records(fields))
 
-        return result
+    @staticmethod
+    def _to_comment_record(comment):
+        return CommentRecord(
+            id=comment.id,
+            author_email=_get_field(comment, 'author', 'emailAddress'),
+            author_name=_get_field(comment, 'author', 'displayName'),
+            created=comment.created,
+            body=comment.body)
 
-    def get_attachment(self, attachment_id):
-        return self.jira_client.attachment(attachment_id)
+    @staticmethod
+    def _to_attachment_records(fields):
+        return tuple(AttachmentRecord(id=a.id, filename=a.filename,
+                                      size=a.size, content=a.content)
+                     for a in getattr(fields, 'attachment', None) or [])
+
+    def _get_jql(self):
+        # an explicit order is required for pages to be consistent
+        return 'project=' + self.project_key + ' ORDER BY key ASC'
+
+    @instrumentation.instrumented('jira.search')
+    def _search(self, jql, start_index, max_results, fields, expand):
+        return self.jira_client.search_issues(
+            jql, startAt=start_index, maxResults=max_results, fields=fields,
+            expand=expand)
+
+
+def _get_field(resource, name, attribute):
+    """
+    :return: the given attribute of a field of a JIRA resource, or None if
+             the field is not set
+    """
+    return getattr(getattr(resource, name, None), attribute, None)
 
 
 if __name__ == '__main__':
     jira = JiraProject('https://jira.activeeon.com', 'SCHEDULING')
 
-    print("Attachment ids -> ", str(jira.get_attachment_information()))
+    print("Attachment ids -> ", str(
+        [(key, a.id) for (key, a) in jira.get_attachment_information()]))
@@ -2,11 +2,14 @@
 
 import os
 import tempfile
-import urllib
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from github import Github
+import requests
+from github import Github, GithubException
 
+import instrumentation
 import utility
 
 from arij import JiraProject
@@ -20,14 +23,16 @@ class Attachments:
 
     def __init__(self, jira_url,
                  github_organization_name,
-                 github_repository_name, working_dir=None):
+                 github_repository_name, working_dir=None, concurrency=8):
         """
         :param jira_url: JIRA endpoint used to fetch issues
         :param github_organization_name: organization name where to create repository for attachments
         :param github_repository_name: name of the repository to create for attachments
         :param working_dir: local space where to save attachments temporarily
+        :param concurrency: number of attachments downloaded concurrently
         """
         self.jira_url = jira_url
+        self.concurrency = concurrency
         self.github_organization_name = github_organization_name
         self.github_repository_name = github_repository_name
 
@@ -44,51 +49,254 @@ class Attachments:
 
     def fetch_from_jira(self, jira_project_key):
         jira_project = JiraProject(self.jira_url, jira_project_key)
-        info = jira_project.get_attachment_information()
+        session = self._create_session()
 
-        for (issue_key, attachment_id) in info:
-            attachment = jira_project.get_attachment(attachment_id)
-            issue_id = issue_key[issue_key.index('-') + 1:]
-            attachment_folder = self.working_dir + '/' + jira_project.project_key.lower() + '/' + issue_id + '/'
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = [executor.submit(self._fetch_attachment, session,
+                                       jira_project, issue_key, attachment)
+                       for (issue_key, attachment) in
+                       self._get_latest_attachments(
+                           jira_project.get_attachment_information())]
 
-            if not os.path.exists(attachment_folder):
-                os.makedirs(attachment_folder)
+            for future in futures:
+                future.result()
 
-            with urllib.request.urlopen(attachment.content) as response, open(
-                                attachment_folder + '/' + attachment.filename,
-                    'wb') as out_file:
-                shutil.copyfileobj(response, out_file)
-                print("Retrieved attachment '{}' for {}".format(
-                    attachment.filename, issue_key))
+        session.close()
 
-    def push_on_github(self, github_authentication_token):
-        self._create_git_repository(github_authentication_token)
+    @staticmethod
+    def _get_latest_attachments(attachment_information):
+        """
+        Keeps a single attachment, the most recent one, among those of an
+        issue with the same filename, since they are saved to the same path
 
-        if utility.execute_command(
-                'cd {} && git init && git checkout --orphan gh-pages && {}'.format(
-                    self.working_dir,
-                    'git remote add origin git@github.com:{}/{}.git'.format(
-                        self.github_organization_name,
-                        self.github_repository_name))) is 0:
-            print("Local git repository and branch created")
-        else:
-            print("Error while creating local git repository and branch")
+        :param attachment_information: (issue key, attachment) pairs
+        """
+        latest = {}
+
+        for (issue_key, attachment) in attachment_information:
+            key = (issue_key, attachment.filename)
+            current = latest.get(key)
+
+            if current is None or int(attachment.id) > int(current[1].id):
+                latest[key] = (issue_key, attachment)
+
+        return list(latest.values())
+
+    def _create_session(self):
+        session = requests.Session()
+        session.verify = False
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.concurrency)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def _fetch_attachment(self, session, jira_project, issue_key, attachment):
+        """
+        Downloads an attachment unless it is already present with the
+        expected size. Data is written to a temporary file, which is
+        resumed if a previous download was interrupted, then renamed
+        """
+        issue_id = issue_key[issue_key.index('-') + 1:]
+        attachment_folder = self.working_dir + '/' + jira_project.project_key.lower() + '/' + issue_id + '/'
+        path = attachment_folder + attachment.filename
+        partial_path = path + '.part'
+
+        if os.path.exists(path) and os.path.getsize(path) == attachment.size:
+            print("Attachment '{}' for {} already retrieved".format(
+                attachment.filename, issue_key))
+            instrumentation.count('jira.attachments_already_retrieved')
+            return
+
+        os.makedirs(attachment_folder, exist_ok=True)
+
+        try:
+            offset = os.path.getsize(partial_path) \
+                if os.path.exists(partial_path) else 0
+
+            if offset > attachment.size:
+                # the partial file cannot belong to this attachment
+                os.remove(partial_path)
+                offset = 0
+
+            if offset < attachment.size:
+                headers = {'Range': 'bytes={}-'.format(offset)} \
+                    if offset > 0 else {}
+
+                with instrumentation.timed('jira.download_attachment'), \
+                        session.get(attachment.content, headers=headers,
+                                    stream=True) as response:
+                    response.raise_for_status()
+
+                    # servers ignoring the range send the whole file again
+                    mode = 'ab' if response.status_code == 206 else 'wb'
+
+                    with open(partial_path, mode) as out_file:
+                        for chunk in response.iter_content(1 << 16):
+                            out_file.write(chunk)
+                            instrumentation.count('jira.attachment_bytes',
+                                                  len(chunk))
+
+            size = os.path.getsize(partial_path)
+
+            if size != attachment.size:
+                instrumentation.record_error('jira.download_attachment')
+                raise IOError("expected {} bytes but got {}".format(
+                    attachment.size, size))
+
+            os.replace(partial_path, path)
+
+            print("Retrieved attachment '{}' for {}".format(
+                attachment.filename, issue_key))
+        except (IOError, requests.RequestException) as e:
+            utility.error("Error while retrieving attachment '{}' for {}: {}".format(
+                attachment.filename, issue_key, e))
+
+    def push_on_github(self, github_authentication_token,
+                       batch_size=256 * 1024 * 1024, retry=3):
+        """
+        Commits and pushes retrieved attachments incrementally: new files are
+        committed per project, by batches of at most batch_size bytes, and
+        each commit is pushed on its own. The remote-tracking branch records
+        what has already been pushed, so that later runs only push commits
+        and attachments that are not on Github yet
+        """
+        if not os.path.exists(os.path.join(self.working_dir, '.git')):
+            self._create_git_repository(github_authentication_token)
+
+            if utility.execute_command(
+                    'cd {} && git init && git checkout --orphan gh-pages && {}'.format(
+                        self.working_dir,
+                        'git remote add origin git@github.com:{}/{}.git'.format(
+                            self.github_organization_name,
+                            self.github_repository_name))) == 0:
+                print("Local git repository and branch created")
+            else:
+                print("Error while creating local git repository and branch")
+                return
+
+        if not self._push_pending_commits(retry):
+            return
+
+        for (project, batch) in self._get_new_file_batches(batch_size):
+            if not self._commit_batch(project, batch) or \
+                    not self._push_pending_commits(retry):
+                print("Error while pushing JIRA attachments backup on Github")
+                return
+
+        print("JIRA attachments backup pushed on Github")
+
+    def _get_new_file_batches(self, batch_size):
+        output = utility.command_output(
+            'cd {} && git ls-files -z --others --exclude-standard'.format(
+                self.working_dir))
+
+        files_per_project = {}
+
+        for path in sorted(f for f in (output or '').split('\0') if f):
+            # partial downloads are completed and renamed by later runs
+            if not path.endswith('.part'):
+                project = path.split('/')[0]
+                files_per_project.setdefault(project, []).append(path)
+
+        for project, paths in sorted(files_per_project.items()):
+            batch = []
+            size = 0
+
+            for path in paths:
+                file_size = os.path.getsize(
+                    os.path.join(self.working_dir, path))
+
+                if batch and size + file_size > batch_size:
+                    yield (project, batch)
+                    batch = []
+                    size = 0
+
+                batch.append(path)
+                size += file_size
+
+            if batch:
+                yield (project, batch)
+
+    def _commit_batch(self, project, paths):
+        pathspec_file = os.path.join(self.working_dir, '.git', 'pathspec')
+
+        with open(pathspec_file, 'w') as f:
+            f.write('\0'.join(paths))
 
         if utility.execute_command(
-                'cd {} && git add -A && git commit -m "Import JIRA attachments for selected projects" && git push origin gh-pages'.format(
-                    self.working_dir)) is 0:
-            print("JIRA attachments backup pushed on Github")
+                'cd {} && git add --pathspec-from-file={} --pathspec-file-nul && git commit -m "Import JIRA attachments for project {}"'.format(
+                    self.working_dir, pathspec_file, project)) == 0:
+            print("{} attachments committed for project {}".format(
+                len(paths), project))
+            return True
         else:
-            print("Error while pushing JIRA attachments backup on Github")
+            print("Error while committing attachments for project {}".format(
+                project))
+            return False
+
+    def _push_pending_commits(self, retry):
+        head = self._resolve_ref('refs/heads/gh-pages')
+
+        if head is None:
+            # nothing has been committed yet
+            return True
+
+        pushed = self._resolve_ref('refs/remotes/origin/gh-pages')
+        commits = utility.command_output(
+            'cd {} && git rev-list --reverse {} {}'.format(
+                self.working_dir, head,
+                '^' + pushed if pushed is not None else ''))
+
+        if commits is None:
+            print("Error while listing commits to push on Github")
+            return False
+
+        for commit in commits.split():
+            if not self._push_commit(commit, retry):
+                return False
+
+        return True
+
+    def _resolve_ref(self, ref):
+        # git exits with 1 when the ref does not exist
+        sha = utility.command_output(
+            'cd {} && git rev-parse --verify -q {}'.format(self.working_dir,
+                                                          ref),
+            expected_returncodes=(0, 1))
+
+        return sha.strip() if sha is not None else None
+
+    def _push_commit(self, commit, retry):
+        for attempt in range(retry + 1):
+            if utility.execute_command(
+                    'cd {} && git push origin {}:refs/heads/gh-pages'.format(
+                        self.working_dir, commit)) == 0:
+                print("Commit {} pushed on Github".format(commit))
+                return True
+
+            if attempt < retry:
+                delay = 2 ** attempt * 10
+                print("Error while pushing commit {}, retry in {} seconds".format(
+                    commit, delay))
+                time.sleep(delay)
+
+        return False
 
     def _create_git_repository(self, github_authentication_token):
         github = Github(github_authentication_token)
         github_organization = github.get_organization(
             self.github_organization_name)
 
-        github_organization.create_repo(
-            self.github_repository_name, has_wiki=False, has_issues=False,
-            has_downloads=False)
+        try:
+            github_organization.create_repo(
+                self.github_repository_name, has_wiki=False, has_issues=False,
+                has_downloads=False)
+        except GithubException:
+            print("Repository '{}' already exists".format(
+                self.github_repository_name))
 
     def delete_github_repository(self, github_authentication_token):
         github = Github(github_authentication_token)
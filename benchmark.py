@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import argh
+
+import fakeservers
+
+GITHUB_ORGANIZATION = 'benchmark'
+GITHUB_TOKEN = 'benchmark-token'
+
+
+class BenchmarkResult:
+    def __init__(self, scenario, issues, wall_time, peak_rss,
+                 jira_requests, github_requests, bytes_received):
+        """
+        :param wall_time: duration of the scenario in seconds
+        :param peak_rss: peak resident set size in bytes of the process
+                         running the scenario
+        """
+        self.scenario = scenario
+        self.issues = issues
+        self.wall_time = wall_time
+        self.peak_rss = peak_rss
+        self.jira_requests = jira_requests
+        self.github_requests = github_requests
+        self.bytes_received = bytes_received
+
+    def get_issues_per_second(self):
+        return self.issues / self.wall_time if self.wall_time > 0 else 0
+
+    def get_requests_per_issue(self):
+        return (self.jira_requests + self.github_requests) / \
+            max(1, self.issues)
+
+    def to_dict(self):
+        return {'scenario': self.scenario, 'issues': self.issues,
+                'wall_time': self.wall_time,
+                'issues_per_second': self.get_issues_per_second(),
+                'requests_per_issue': self.get_requests_per_issue(),
+                'jira_requests': self.jira_requests,
+                'github_requests': self.github_requests,
+                'bytes_received': self.bytes_received,
+                'peak_rss': self.peak_rss}
+
+    def __str__(self):
+        return "{}: {} issues in {:.1f}s, {:.1f} issues/s, {:.2f} requests/issue ({} JIRA, {} Github), {:.1f} MB received, peak RSS {:.1f} MB".format(
+            self.scenario, self.issues, self.wall_time,
+            self.get_issues_per_second(), self.get_requests_per_issue(),
+            self.jira_requests, self.github_requests,
+            self.bytes_received / (1024 * 1024),
+            self.peak_rss / (1024 * 1024))
+
+
+class Benchmark:
+    """
+    Runs migration steps against local stand-ins for JIRA and Github
+    serving synthetic projects. Each scenario runs in a fresh process so
+    that its peak RSS is measured on its own, while servers count the
+    requests it sends
+    """
+
+    def __init__(self, projects, jira_server, github_server):
+        self.projects = projects
+        self.jira_server = jira_server
+        self.github_server = github_server
+
+    def run(self, scenario, **options):
+        """
+        :param scenario: name of a function of this module run in a
+                         separate process with the URLs of the servers,
+                         the keys of projects and options
+        """
+        self.jira_server.reset_stats()
+        self.github_server.reset_stats()
+
+        # spawned processes do not inherit the memory of this one
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')) as executor:
+            (wall_time, peak_rss) = executor.submit(
+                globals()[scenario], self.jira_server.url,
+                self.github_server.url, [p.key for p in self.projects],
+                **options).result()
+
+        return BenchmarkResult(
+            scenario[:-len('_scenario')].replace('_', '-'),
+            sum(p.issues for p in self.projects), wall_time, peak_rss,
+            self.jira_server.get_request_count(),
+            self.github_server.get_request_count(),
+            self.jira_server.bytes_sent + self.github_server.bytes_sent)
+
+
+def import_issues_scenario(jira_url, github_url, project_keys,
+                           concurrency=4, convert=False):
+    import arij
+    import buhtig
+    import confluence
+    import journal
+    import ratelimit
+    from github import Github
+
+    class UnconvertedGithubComet(buhtig.GithubComet):
+        # content is left as is, so that results do not depend on
+        # confluence2markdown being installed
+        @staticmethod
+        def confluence2markdown(s):
+            return s
+
+    comet_class = buhtig.GithubComet if convert else UnconvertedGithubComet
+    github = Github(GITHUB_TOKEN, base_url=github_url)
+    rate_limiter = ratelimit.RateLimiter()
+
+    with tempfile.TemporaryDirectory(suffix='-benchmark') as working_dir:
+        start = time.monotonic()
+
+        for key in project_keys:
+            markdown_cache = confluence.MarkdownCache(
+                os.path.join(working_dir, 'markdown-cache.sqlite')) \
+                if convert else None
+            import_journal = journal.ImportJournal(
+                os.path.join(working_dir, 'import-journal.sqlite'))
+
+            github_comet = comet_class(arij.JiraProject(jira_url, key),
+                                       github, GITHUB_ORGANIZATION,
+                                       key.lower(), GITHUB_TOKEN,
+                                       markdown_cache, import_journal,
+                                       rate_limiter, api_url=github_url)
+            github_comet.create_milestones()
+            github_comet.import_issues(concurrency=concurrency)
+
+            import_journal.close()
+
+            if markdown_cache is not None:
+                markdown_cache.close()
+
+        wall_time = time.monotonic() - start
+
+    return wall_time, _get_peak_rss()
+
+
+def import_attachments_scenario(jira_url, github_url, project_keys,
+                                concurrency=8, push=True):
+    import utility
+    from attachments import Attachments
+
+    with tempfile.TemporaryDirectory(suffix='-benchmark') as directory:
+        working_dir = os.path.join(directory, 'attachments')
+        remote = os.path.join(directory, 'remote.git')
+
+        attachments = Attachments(jira_url, GITHUB_ORGANIZATION,
+                                  'attachments', working_dir=working_dir,
+                                  concurrency=concurrency)
+
+        if push:
+            # attachments are pushed to a local bare repository instead
+            # of Github
+            utility.execute_command(
+                'git init -q --bare {} && cd {} && git init -q && git checkout -q --orphan gh-pages && git config user.name benchmark && git config user.email benchmark@localhost && git remote add origin {}'.format(
+                    remote, working_dir, remote))
+
+        start = time.monotonic()
+
+        for key in project_keys:
+            attachments.fetch_from_jira(key)
+
+        if push:
+            attachments.push_on_github(GITHUB_TOKEN)
+
+        wall_time = time.monotonic() - start
+
+    return wall_time, _get_peak_rss()
+
+
+def _get_peak_rss():
+    import instrumentation
+
+    # timings of stages help to interpret results
+    instrumentation.recorder.report()
+
+    # ru_maxrss is given in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _run(scenario, projects=1, issues=1000, comments=5, attachments=1,
+         attachment_size=64 * 1024, jira_latency=0.0, github_latency=0.0,
+         import_delay=1.0, failure_rate=0.0, rate_limit=None,
+         rate_limit_window=3600, output=None, **options):
+    synthetic_projects = [
+        fakeservers.SyntheticProject(
+            'BENCH{}'.format(chr(ord('A') + i)), issues=issues,
+            comments=comments, attachments=attachments,
+            attachment_size=attachment_size)
+        for i in range(projects)]
+
+    jira_server = fakeservers.FakeJiraServer(
+        synthetic_projects, latency=jira_latency).start()
+    github_server = fakeservers.FakeGithubServer(
+        latency=github_latency, import_delay=import_delay,
+        failure_rate=failure_rate, rate_limit=rate_limit,
+        rate_limit_window=rate_limit_window).start()
+
+    try:
+        result = Benchmark(synthetic_projects, jira_server,
+                           github_server).run(scenario, **options)
+    finally:
+        jira_server.stop()
+        github_server.stop()
+
+    print(result)
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(result.to_dict(), f, indent=2, sort_keys=True)
+
+    return result
+
+
+def import_issues(projects=1, issues=1000, comments=5, jira_latency=0.0,
+                  github_latency=0.0, import_delay=1.0, failure_rate=0.0,
+                  rate_limit=None, rate_limit_window=3600, concurrency=4,
+                  convert=False, output=None):
+    """
+    Imports synthetic projects into a stand-in Github with the Comet client
+
+    :param convert: whether content is converted with confluence2markdown,
+                    which has to be installed
+    """
+    _run('import_issues_scenario', projects, issues, comments,
+         attachments=0, jira_latency=jira_latency,
+         github_latency=github_latency, import_delay=import_delay,
+         failure_rate=failure_rate, rate_limit=rate_limit,
+         rate_limit_window=rate_limit_window, output=output,
+         concurrency=concurrency, convert=convert)
+
+
+def import_attachments(projects=1, issues=1000, attachments=1,
+                       attachment_size=64 * 1024, jira_latency=0.0,
+                       concurrency=8, push=True, output=None):
+    """
+    Downloads the attachments of synthetic projects from a stand-in JIRA and
+    pushes them to a local bare repository
+
+    :param push: whether attachments are committed and pushed once fetched
+    """
+    _run('import_attachments_scenario', projects, issues, comments=0,
+         attachments=attachments, attachment_size=attachment_size,
+         jira_latency=jira_latency, output=output, concurrency=concurrency,
+         push=push)
+
+
+if __name__ == '__main__':
+    argh.dispatch_commands([import_issues, import_attachments])
@@ -1,7 +1,13 @@
+import collections
+import contextlib
 import json
 import re
 import datetime
 import subprocess
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 
 from github import GithubException
 from github.GithubObject import NotSet
@@ -10,6 +16,12 @@ import requests
 import aniso8601
 import unidecode as unidecode
 
+import confluence
+import githubcache
+import instrumentation
+import journal
+import ratelimit
+import utility
 from attachments import Attachments
 
 
@@ -21,53 +33,115 @@ class GithubComet:
 
     def __init__(self, jira_project,
                  github, github_organization_name,
-                 github_project_name, github_token):
+                 github_project_name, github_token, markdown_cache=None,
+                 journal=None, rate_limiter=None, session=None,
+                 api_url='https://api.github.com', github_cache=None):
+        """
+        :param session: HTTP session used for Comet requests, a pooled
+                        session is created when None
+        :param api_url: root URL of the Github API, which may point to a
+                        stub server
+        :param github_cache: cache of Github listings shared between
+                             projects, a new one is created when None
+        """
 
         self.github = github
+        self.rate_limiter = rate_limiter \
+            if rate_limiter is not None else ratelimit.RateLimiter()
 
-        self.github_organization = \
-            self.github.get_organization(
-                github_organization_name)
-        self.github_repository = \
-            self.github_organization.get_repo(
-                github_project_name)
+        self.github_cache = github_cache if github_cache is not None \
+            else githubcache.GithubCache(github, self.rate_limiter)
+
+        self.github_organization = self.github_cache.get_organization(
+            github_organization_name)
+        self.github_repository = self.github_cache.get_repository(
+            github_organization_name, github_project_name)
 
         self.github_organization_name = github_organization_name
         self.github_repository_name = github_project_name
         self.github_token = github_token
 
-        self.github_api_url = 'https://api.github.com/repos/{}/{}/import/issues'.format(
-            github_organization_name, github_project_name)
+        self.github_repository_url = '{}/repos/{}/{}'.format(
+            api_url, github_organization_name, github_project_name)
+        self.github_api_url = self.github_repository_url + '/import/issues'
 
         self.headers = {
             'Accept': 'application/vnd.github.golden-comet-preview+json',
+            'Accept-Encoding': 'gzip, deflate',
             'Authorization': 'token ' + self.github_token,
             'User-Agent': 'Bobot'
         }
 
+        self.session = session if session is not None \
+            else self._create_session()
+        self.request_stats = RequestStats()
+
         self.jira_project = jira_project
+        self.markdown_cache = markdown_cache
+        self.journal = journal
         self.github_project_milestones = {}
-        self.github_organization_members = set()
+        self.github_organization_members = self.github_cache.get_members(
+            github_organization_name)
+
+    def _call_github(self, action):
+        # projects share the quota of the rate limiter equally
+        return self.rate_limiter.call(self.github, action,
+                                      self.jira_project.project_key)
+
+    @staticmethod
+    def _create_session():
+        session = requests.Session()
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=4)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
 
-        [self.github_organization_members.add(member.login) for member in
-         self.github_organization.get_members()]
+        return session
+
+    def _request(self, method, url, headers=None, stage=None, **kwargs):
+        """
+        :param headers: headers overriding the default ones
+        :param stage: name under which the duration of HTTP calls is
+                      instrumented, the wait for the rate limiter apart
+        """
+        headers = dict(self.headers, **headers) \
+            if headers is not None else self.headers
+
+        while True:
+            self.rate_limiter.acquire(self.jira_project.project_key)
+
+            start = time.monotonic()
+
+            with instrumentation.timed(stage) if stage is not None \
+                    else contextlib.nullcontext():
+                r = self.session.request(method, url, headers=headers,
+                                         **kwargs)
+
+            self.request_stats.record(method, r.status_code,
+                                      time.monotonic() - start,
+                                      len(r.content))
+
+            if not self.rate_limiter.update(r.headers, r.status_code,
+                                            r.text):
+                return r
 
     def format_content(self, issue):
-        created = issue.fields.created
+        created = issue.created
         creation_datetime = self._format_date(created)
 
         try:
-            description = self.confluence2markdown(issue.fields.description)
+            description = self._convert(issue.description)
         except:
-            description = issue.fields.description
+            description = issue.description
 
             if description is None:
                 description = "*No description*"
 
         result = '<a href="{}/browse/{}" title="{}">Original issue</a> created by <a href="mailto:{}">{}</a> on {} - {}\n\n<hr />\n\n{}'.format(
             self.jira_project.jira_url, issue.key, issue.key,
-            self._spam_protection(issue.fields.reporter.emailAddress),
-            issue.fields.reporter.displayName,
+            self._spam_protection(issue.reporter_email),
+            issue.reporter_name,
             creation_datetime, issue.key, description)
 
         return result
@@ -75,11 +149,25 @@ class GithubComet:
     def format_comment(self, issue, comment):
         return '<a href="{}/browse/{}?focusedCommentId={}">Original comment</a> posted by <a href="mailto:{}">{}</a> on {}\n\n<hr />\n\n{}'.format(
             self.jira_project.jira_url, issue.key, comment.id,
-            self._spam_protection(comment.author.emailAddress.lower()),
-            comment.author.displayName, self._format_date(comment.created),
-            self.confluence2markdown(comment.body)
+            self._spam_protection(comment.author_email.lower()),
+            comment.author_name, self._format_date(comment.created),
+            self._convert(comment.body)
         )
 
+    def _convert(self, s):
+        try:
+            if self.markdown_cache is None:
+                return self.confluence2markdown(s)
+
+            return self.markdown_cache.get_or_convert(
+                unidecode.unidecode(s), self.confluence2markdown)
+        except confluence.ConversionError as e:
+            # content is kept as is, and never cached, when it cannot be
+            # converted
+            print("Content kept as is after failed conversion: {}".format(e))
+
+            return s
+
     def format_priority(self, issue):
         priority = self.jira_project.get_priority(issue)
 
@@ -101,59 +189,162 @@ class GithubComet:
 
     def create_labels(self, labels):
         for name, color in labels.items():
-            self.github_repository.create_label(name, color)
+            self._call_github(
+                lambda: self.github_repository.create_label(name, color))
 
-    def delete_labels(self):
-        labels = self.github_repository.get_labels()
-        [label.delete() for label in labels]
+    def sync_labels(self, labels, concurrency=4):
+        """
+        Reconciles the labels of the repository with the given ones: only
+        missing labels are created, labels with another color are updated
+        and other labels are deleted. Independent calls are sent
+        concurrently
+        """
+        existing_labels = self.github_cache.get_labels(
+            self.github_organization_name, self.github_repository_name)
 
-    def create_milestones(self):
-        try:
-            versions = self.jira_project.get_project_versions()
+        calls = []
 
-            for version in versions:
-                name = self._uniformize_milestone_name(version.name)
+        for name, color in labels.items():
+            if name not in existing_labels:
+                calls.append(('POST', '', {'name': name, 'color': color}))
+            elif existing_labels[name].lower() != color.lower():
+                calls.append(('PATCH', name, {'color': color}))
+
+        for name in existing_labels:
+            if name not in labels:
+                calls.append(('DELETE', name, None))
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(
+                lambda call: self._update_label(*call), calls))
+
+        if all(results):
+            self.github_cache.set_labels(self.github_organization_name,
+                                         self.github_repository_name,
+                                         labels)
+        else:
+            # labels are listed again next time
+            self.github_cache.invalidate_labels(self.github_organization_name,
+                                                self.github_repository_name)
 
-                release_date = NotSet
+        print("Labels synchronized for {}: {} changes".format(
+            self.github_repository_name, len(calls)))
 
-                try:
-                    if version.releaseDate is not None:
-                        release_date = datetime.datetime.strptime(
-                            version.releaseDate, "%Y-%m-%d")
-                except AttributeError:
-                    pass
+    def _update_label(self, method, name, data):
+        url = self.github_repository_url + '/labels'
 
-                try:
-                    description = version.description
-                except AttributeError:
-                    description = NotSet
+        if name:
+            url += '/' + urllib.parse.quote(name, safe='')
 
-                try:
-                    milestone_number = self.github_repository.create_milestone(
-                        name, "closed" if version.released else "open",
-                        description, release_date
-                    ).number
+        r = self._request(method, url, json=data,
+                          headers={'Accept': 'application/vnd.github.v3+json'})
 
-                    self.github_project_milestones[name] = milestone_number
+        if r.status_code not in (200, 201, 204):
+            print("Error while updating label {}: {} {}".format(
+                name or data['name'], r.status_code, r.text))
+            return False
 
-                    print("Milestone {} created".format(name))
-                except GithubException:
-                    print("Milestone {} already created".format(name))
+        return True
+
+    def delete_labels(self):
+        labels = self._call_github(
+            lambda: list(self.github_repository.get_labels()))
+        [self._call_github(label.delete) for label in labels]
+
+    def create_milestones(self, concurrency=4):
+        """
+        Creates a milestone for each version of the JIRA project. Existing
+        milestones are listed once to build the index from uniformized names
+        to milestone numbers, so that only missing ones are created,
+        concurrently. The index is kept in the Github cache
+        """
+        try:
+            versions = self.jira_project.get_project_versions()
         except JIRAError:
             print("No project version found for '{}'".format(self.jira_project.project_key))
+            return
+
+        self.github_project_milestones = self.github_cache.get_milestones(
+            self.github_organization_name, self.github_repository_name)
+
+        missing_versions = {}
+
+        for version in versions:
+            name = self._uniformize_milestone_name(version.name)
+
+            if name not in self.github_project_milestones:
+                missing_versions.setdefault(name, version)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            numbers = list(executor.map(
+                lambda item: self._create_milestone(*item),
+                missing_versions.items()))
+
+        for name, number in zip(missing_versions, numbers):
+            if number is not None:
+                self.github_project_milestones[name] = number
+
+        if None in numbers:
+            # milestones created meanwhile, e.g. by another project mapped
+            # to the same repository, are indexed from a new listing
+            self.github_cache.invalidate_milestones(
+                self.github_organization_name, self.github_repository_name)
+            self.github_project_milestones = self.github_cache.get_milestones(
+                self.github_organization_name, self.github_repository_name)
+        else:
+            self.github_cache.set_milestones(self.github_organization_name,
+                                             self.github_repository_name,
+                                             self.github_project_milestones)
+
+    def _create_milestone(self, name, version):
+        release_date = NotSet
+
+        try:
+            if version.releaseDate is not None:
+                release_date = datetime.datetime.strptime(
+                    version.releaseDate, "%Y-%m-%d")
+        except AttributeError:
+            pass
+
+        try:
+            description = version.description
+        except AttributeError:
+            description = NotSet
+
+        try:
+            milestone_number = self._call_github(
+                lambda: self.github_repository.create_milestone(
+                    name, "closed" if version.released else "open",
+                    description, release_date)
+            ).number
+
+            print("Milestone {} created".format(name))
+
+            return milestone_number
+        except GithubException:
+            print("Milestone {} already created".format(name))
+
+            return None
 
     @staticmethod
+    @instrumentation.instrumented('c2m.convert')
     def confluence2markdown(s):
         s = unidecode.unidecode(s)
         s = s.encode('utf-8')
 
+        try:
+            return confluence.get_shared_pool().convert(s).decode('utf-8')
+        except confluence.ConversionError:
+            # fall back to a dedicated c2m process for this document
+            pass
+
         (stdout, stderr) = \
             subprocess.Popen(["c2m"], stdin=subprocess.PIPE,
                              stdout=subprocess.PIPE,
                              stderr=subprocess.PIPE).communicate(input=s)
 
         if stderr:
-            stdout = s
+            raise confluence.ConversionError(stderr.decode('utf-8'))
 
         return stdout.decode('utf-8')
 
@@ -176,10 +367,118 @@ class GithubComet:
         return name.strip()
 
     def import_issues(self, github_attachments_repository_name=None,
-                      mapping_usernames=None, default_assignee=None):
-        for issue in self.jira_project.get_issues():
-            self._import_issue(issue, github_attachments_repository_name,
-                               mapping_usernames, default_assignee)
+                      mapping_usernames=None, default_assignee=None,
+                      concurrency=1):
+        """
+        Imports all issues of the JIRA project. Up to concurrency workers
+        fetch comments and convert content in parallel, whereas payloads
+        are submitted one by one, in issue key order, so that Github
+        issue numbers follow JIRA ones. Import statuses are checked
+        in background and failed imports are submitted again.
+
+        When a journal is set, issues it records as imported, or whose
+        import is still in progress, are skipped
+        """
+        in_progress = self._resume_submitted_imports()
+        issues = (issue for issue in self.jira_project.iter_issues()
+                  if not self._is_imported(issue.key, in_progress))
+
+        tracker = ImportStatusTracker(self, self.journal)
+        tracker.start()
+
+        try:
+            with ThreadPoolExecutor(
+                    max_workers=max(1, concurrency)) as executor:
+                payloads = utility.ordered_map(
+                    executor,
+                    lambda issue: (issue, self._create_payload(
+                        issue, github_attachments_repository_name,
+                        mapping_usernames, default_assignee)),
+                    issues,
+                    max(1, concurrency) * 2)
+
+                for index, (issue, payload) in enumerate(payloads):
+                    self._submit_issue(tracker, issue.key, payload)
+                    self._resubmit_failed_imports(tracker)
+
+                    if index % 100 == 99:
+                        self.rate_limiter.report()
+
+            while tracker.wait():
+                self._resubmit_failed_imports(tracker)
+        finally:
+            tracker.stop()
+
+        tracker.report()
+        self.rate_limiter.report()
+        self.request_stats.report()
+
+    def _resume_submitted_imports(self):
+        """
+        Updates the journal with the outcome of the imports submitted by a
+        previous run
+
+        :return: the keys of issues whose import is still in progress
+        """
+        in_progress = set()
+
+        if self.journal is None:
+            return in_progress
+
+        for (key, import_id) in self.journal.get_submitted(
+                self.jira_project.project_key):
+            r = self._check_issue_import(import_id)
+            status = r.get('status')
+
+            if status == 'imported':
+                self.journal.set_imported(key, import_id,
+                                          self._get_issue_number(r))
+            elif status == 'pending':
+                in_progress.add(key)
+            else:
+                # failed, or unknown to Github, e.g. once expired: the issue
+                # is submitted again
+                print("Import {} of {} is {}, issue will be submitted again".format(
+                    import_id, key, status or "unknown"))
+                self.journal.set_failed(key, import_id)
+
+        return in_progress
+
+    def _is_imported(self, key, in_progress):
+        if self.journal is None:
+            return False
+
+        if key in in_progress:
+            print("{} is still being imported, skipping".format(key))
+            return True
+
+        if self.journal.get_status(key) == journal.IMPORTED:
+            print("{} already imported, skipping".format(key))
+            return True
+
+        return False
+
+    @staticmethod
+    def _get_issue_number(import_status):
+        issue_url = import_status.get('issue_url')
+
+        if issue_url is None:
+            return None
+
+        return int(issue_url[issue_url.rindex('/') + 1:])
+
+    def _submit_issue(self, tracker, key, payload, attempt=0):
+        import_id = self._import_issue(key, payload)
+
+        if import_id is not None:
+            tracker.track(key, import_id, payload, attempt)
+        else:
+            tracker.reject(key)
+
+    def _resubmit_failed_imports(self, tracker):
+        for (key, payload, attempt) in tracker.pop_retries():
+            print("Retry in progress for issue " + key)
+            self._submit_issue(tracker, key, payload, attempt + 1)
 
     @staticmethod
     def _append_label(labels, new_label_prefix, new_label):
@@ -189,9 +488,8 @@ class GithubComet:
 
             labels.append(new_label)
 
-    def _import_issue(self, issue, github_attachments_repository_name=None,
-                      mapping_usernames=None, default_assignee=None, retry=3):
-        key = issue.key
+    def _create_payload(self, issue, github_attachments_repository_name=None,
+                        mapping_usernames=None, default_assignee=None):
         title = self.jira_project.get_title(issue)
         content = self.format_content(issue)
         created_at = self.jira_project.get_creation_datetime(issue)
@@ -248,49 +546,59 @@ class GithubComet:
         payload = json.dumps(payload)
         payload = pattern.sub(r'\1', payload)
 
-        r = requests.post(self.github_api_url,
-                          headers=self.headers,
-                          data=payload)
+        return payload
 
-        if r.status_code is not 202:
+    def _import_issue(self, key, payload):
+        """
+        Submits the payload of an issue to the Comet API
+
+        :return: the import id assigned by Github or None if the import
+                 request has been rejected
+        """
+        r = self._request('POST', self.github_api_url, data=payload,
+                          stage='github.import_issue')
+
+        if r.status_code != 202:
+            instrumentation.record_error('github.import_issue')
             print("Async import failed for {}: {} {}".format(
                 key, r.status_code, r.text))
             print("data=" + payload)
-        else:
-            self._check_issue_import(issue, github_attachments_repository_name,
-                                     default_assignee, key, r.json()['id'],
-                                     retry)
 
-    def _check_issue_import(self, issue, github_attachments_repository_name,
-                            default_assignee, key, issue_id, retry):
-        r = requests.get(self.github_api_url + "/" + str(issue_id),
-                         headers=self.headers).json()
+            return None
 
-        if r['status'] == 'failed':
-            print(
-                "Import has failed for issue {}:\n{}".format(key, r['errors']))
+        return r.json()['id']
 
-            if r['errors'][0]['resource'] == 'Internal Error':
-                print(
-                    "Error was internal, retry is not required since issue should have been imported")
-                # if retry > 0 and r['errors'][0]['resource'] == 'Internal Error':
-                #     print("Retry in progress for issue " + key)
-                #     self._import_issue(issue, github_attachments_repository_name, default_assignee, retry - 1)
-        else:
-            print("{} imported with success".format(key))
+    def _check_issue_import(self, import_id):
+        return self._request(
+            'GET', self.github_api_url + "/" + str(import_id),
+            stage='github.check_issue_import').json()
+
+    def _list_issue_imports(self, since):
+        page = 1
+        per_page = 100
+
+        while True:
+            entries = self._request('GET', self.github_api_url,
+                                    params={'since': since, 'page': page,
+                                            'per_page': per_page},
+                                    stage='github.list_issue_imports').json()
+
+            yield from entries
+
+            if len(entries) < per_page:
+                break
+
+            page += 1
 
     def _create_comments(self, issue, github_attachments_repository_name):
         result = []
 
-        issue = self.jira_project.get_comments(issue)
-
-        for comment in issue.fields.comment.comments:
+        for comment in self.jira_project.get_issue_comments(issue):
             result.append(self._create_comment(issue, comment))
 
         attachments = self.jira_project.get_attachments(issue)
 
-        if len(
-                attachments) > 0 and github_attachments_repository_name is not None:
+        if attachments and github_attachments_repository_name is not None:
             items = []
 
             for attachment in attachments:
@@ -304,7 +612,7 @@ class GithubComet:
             comment = '\n'.join(items)
             comment = 'Attachment' + plurial + ":\n" + comment
             result.insert(0, self._create_raw_comment(comment,
-                                                      issue.fields.created))
+                                                      issue.created))
 
         return result
 
@@ -320,3 +628,238 @@ class GithubComet:
             'body': self.format_comment(issue, comment),
             'created_at': aniso8601.parse_datetime(comment.created).isoformat()
         }
+
+
+class RequestStats:
+    """
+    Latency, response size and status of the HTTP requests sent by a client
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.total_latency = 0
+        self.max_latency = 0
+        self.total_size = 0
+        self.statuses = collections.Counter()
+
+        self._lock = threading.Lock()
+
+    def record(self, method, status_code, latency, size):
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_size += size
+            self.statuses['{} {}'.format(method, status_code)] += 1
+
+    def report(self):
+        with self._lock:
+            if self.requests == 0:
+                return
+
+            print("{} requests, {:.0f} ms average latency, {:.0f} ms max, {} bytes received, statuses: {}".format(
+                self.requests, 1000 * self.total_latency / self.requests,
+                1000 * self.max_latency, self.total_size,
+                dict(self.statuses)))
+
+
+class ImportStatusTracker:
+    """
+    Collects the ids of Comet imports submitted for a repository and polls
+    their status in background, by batches, with the repository-wide
+    import listing. Failed imports are made available for resubmission.
+    """
+
+    def __init__(self, github_comet, import_journal=None, min_interval=2,
+                 max_interval=60, max_retries=3):
+        """
+        :param github_comet: client used to query the Comet API
+        :param import_journal: journal recording import statuses, if any
+        :param min_interval: delay in seconds between two polls while
+                             imports are progressing
+        :param max_interval: upper bound for the delay between two polls
+                             when no progress is observed
+        :param max_retries: number of times a failed import is resubmitted
+        """
+        self.github_comet = github_comet
+        self.journal = import_journal
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_retries = max_retries
+
+        self.imported = 0
+        self.failed = 0
+
+        # import id -> (key, payload, attempt, submission date)
+        self._pending = {}
+        self._retries = collections.deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+        self._thread.join()
+
+    def track(self, key, import_id, payload, attempt=0):
+        if self.journal is not None:
+            self.journal.set_submitted(key, import_id)
+
+        with self._condition:
+            # the poller only waits for a first import, later ones are
+            # picked up by its next poll
+            wake_up = not self._pending
+            self._pending[import_id] = (
+                key, payload, attempt, datetime.datetime.utcnow())
+
+            if wake_up:
+                self._condition.notify_all()
+
+    def reject(self, key):
+        if self.journal is not None:
+            self.journal.set_failed(key)
+
+        with self._condition:
+            self.failed += 1
+
+    def pop_retries(self):
+        with self._condition:
+            result = list(self._retries)
+            self._retries.clear()
+
+        return result
+
+    def wait(self):
+        """
+        Blocks until all tracked imports are complete or some failed
+        imports have to be submitted again
+
+        :return: True if failed imports are waiting for resubmission
+        """
+        with self._condition:
+            while self._pending and not self._retries:
+                self._condition.wait()
+
+            return len(self._retries) > 0
+
+    def report(self):
+        print("{} issues imported, {} issues failed".format(
+            self.imported, self.failed))
+
+    def _run(self):
+        interval = self.min_interval
+
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+
+                # notifications for new imports or completions do not
+                # shorten the delay between two polls
+                deadline = time.monotonic() + interval
+
+                while not self._stopped:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        break
+
+                    self._condition.wait(remaining)
+
+                if self._stopped:
+                    return
+
+                # some margin is kept for clock skew with Github
+                since = min(p[3] for p in self._pending.values()) - \
+                    datetime.timedelta(seconds=60)
+
+            try:
+                progress = self._poll(since.strftime('%Y-%m-%dT%H:%M:%SZ'))
+            except Exception as e:
+                print("Error while polling import statuses: {}".format(e))
+                progress = False
+
+            interval = self.min_interval if progress else min(
+                interval * 2, self.max_interval)
+
+    def _poll(self, since):
+        statuses = {}
+
+        for entry in self.github_comet._list_issue_imports(since):
+            statuses[entry['id']] = entry
+
+        # imports missing from the listing for too long are checked one
+        # by one so that the tracker never waits forever on them
+        overdue = datetime.datetime.utcnow() - datetime.timedelta(
+            seconds=self.max_interval)
+
+        with self._condition:
+            missing = [import_id for import_id, p in self._pending.items()
+                       if import_id not in statuses and p[3] < overdue]
+
+        for import_id in missing:
+            statuses[import_id] = self.github_comet._check_issue_import(
+                import_id)
+
+        progress = False
+
+        for import_id, entry in statuses.items():
+            with self._condition:
+                pending = self._pending.get(import_id)
+
+            if pending is None or entry['status'] == 'pending':
+                continue
+
+            progress = True
+            (key, payload, attempt, _) = pending
+
+            if entry['status'] == 'failed':
+                errors = self.github_comet._check_issue_import(
+                    import_id).get('errors', [])
+                self._on_failure(import_id, key, payload, attempt, errors)
+            else:
+                print("{} imported with success".format(key))
+
+                if self.journal is not None:
+                    self.journal.set_imported(
+                        key, import_id,
+                        GithubComet._get_issue_number(entry))
+
+                with self._condition:
+                    del self._pending[import_id]
+                    self.imported += 1
+                    self._condition.notify_all()
+
+        return progress
+
+    def _on_failure(self, import_id, key, payload, attempt, errors):
+        print("Import has failed for issue {}:\n{}".format(key, errors))
+
+        internal_error = errors and \
+            errors[0].get('resource') == 'Internal Error'
+
+        if self.journal is not None:
+            if internal_error:
+                self.journal.set_imported(key, import_id)
+            else:
+                self.journal.set_failed(key, import_id)
+
+        with self._condition:
+            del self._pending[import_id]
+
+            if internal_error:
+                print(
+                    "Error was internal, retry is not required since issue should have been imported")
+                self.imported += 1
+            elif attempt < self.max_retries:
+                self._retries.append((key, payload, attempt))
+            else:
+                self.failed += 1
+
+            self._condition.notify_all()
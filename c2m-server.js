@@ -0,0 +1,49 @@
+#!/usr/bin/env node
+
+// Long-lived confluence2markdown worker used by confluence.py.
+//
+// Documents are read from stdin, each one prefixed by its length in bytes
+// (4 bytes, big-endian). Every response written on stdout starts with one
+// status byte (0 on success, 1 on error) followed by the length of the
+// result (4 bytes, big-endian) and the result itself.
+
+'use strict';
+
+const c2m = require('confluence2markdown');
+const convert = typeof c2m === 'function' ? c2m : c2m.convert;
+
+let buffer = Buffer.alloc(0);
+
+function reply(status, result) {
+    const header = Buffer.alloc(5);
+
+    header.writeUInt8(status, 0);
+    header.writeUInt32BE(result.length, 1);
+
+    process.stdout.write(Buffer.concat([header, result]));
+}
+
+process.stdin.on('data', function (chunk) {
+    buffer = Buffer.concat([buffer, chunk]);
+
+    while (buffer.length >= 4) {
+        const length = buffer.readUInt32BE(0);
+
+        if (buffer.length < 4 + length) {
+            break;
+        }
+
+        const document = buffer.slice(4, 4 + length).toString('utf8');
+        buffer = buffer.slice(4 + length);
+
+        try {
+            reply(0, Buffer.from(String(convert(document)), 'utf8'));
+        } catch (e) {
+            reply(1, Buffer.from(String(e), 'utf8'));
+        }
+    }
+});
+
+process.stdin.on('end', function () {
+    process.exit(0);
+});
@@ -0,0 +1,264 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import struct
+import subprocess
+import threading
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'c2m-server.js')
+
+
+class ConversionError(Exception):
+    pass
+
+
+class ConversionServer:
+    """
+    Long-lived Node process converting Confluence wiki markup to markdown
+    with confluence2markdown. Documents are exchanged over pipes with
+    length-prefixed frames (see c2m-server.js).
+    """
+
+    def __init__(self, env=None):
+        self.process = subprocess.Popen(['node', SERVER_SCRIPT],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        env=env)
+        self.converted = 0
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def convert(self, data):
+        """
+        :param data: document to convert, as bytes
+        :return: converted document, as bytes
+        """
+        try:
+            self.process.stdin.write(struct.pack('>I', len(data)) + data)
+            self.process.stdin.flush()
+
+            (status, length) = struct.unpack('>BI', self._read(5))
+            result = self._read(length)
+        except (OSError, struct.error) as e:
+            self.close()
+            raise ConversionError(str(e))
+
+        if status != 0:
+            raise ConversionError(result.decode('utf-8'))
+
+        self.converted += 1
+
+        return result
+
+    def _read(self, length):
+        chunks = []
+
+        while length > 0:
+            chunk = self.process.stdout.read(length)
+
+            if not chunk:
+                raise OSError("confluence2markdown server has exited")
+
+            chunks.append(chunk)
+            length -= len(chunk)
+
+        return b''.join(chunks)
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+        self.process.kill()
+        self.process.wait()
+
+
+class ConversionServerPool:
+    """
+    Bounded set of conversion servers shared between threads. Servers are
+    started lazily and replaced when they die.
+    """
+
+    def __init__(self, size=None):
+        self.size = size if size is not None else os.cpu_count() or 1
+        self.available = True
+
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._env = None
+
+    def convert(self, data):
+        server = self._acquire()
+
+        try:
+            return server.convert(data)
+        except ConversionError:
+            if not server.is_alive() and server.converted == 0:
+                # the server cannot even start (e.g. module not installed)
+                self.available = False
+
+            raise
+        finally:
+            self._release(server)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _acquire(self):
+        if not self.available:
+            raise ConversionError("confluence2markdown server is unavailable")
+
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                start = self._started < self.size
+
+                if start:
+                    self._started += 1
+
+            if start:
+                try:
+                    return ConversionServer(self._get_env())
+                except OSError as e:
+                    with self._lock:
+                        self._started -= 1
+
+                    self.available = False
+                    raise ConversionError(str(e))
+
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                pass
+
+    def _release(self, server):
+        if server.is_alive():
+            self._idle.put(server)
+        else:
+            with self._lock:
+                self._started -= 1
+
+    def _get_env(self):
+        if self._env is None:
+            # confluence2markdown is installed globally with npm
+            env = dict(os.environ)
+
+            try:
+                node_path = subprocess.check_output(
+                    ['npm', 'root', '-g'],
+                    universal_newlines=True).strip()
+                env['NODE_PATH'] = os.pathsep.join(
+                    p for p in [node_path, env.get('NODE_PATH')] if p)
+            except (OSError, subprocess.CalledProcessError):
+                pass
+
+            self._env = env
+
+        return self._env
+
+
+class MarkdownCache:
+    """
+    On-disk cache of converted documents. Entries are keyed by a hash of
+    the document to convert and of the converter version so that a new
+    confluence2markdown release invalidates previous conversions.
+    """
+
+    def __init__(self, path, converter_version=None):
+        self.path = path
+        self.converter_version = converter_version \
+            if converter_version is not None else get_converter_version()
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS markdown '
+            '(digest TEXT PRIMARY KEY, content TEXT NOT NULL)')
+        self._connection.commit()
+
+    def get_or_convert(self, s, converter):
+        """
+        :param s: unidecoded document to convert
+        :param converter: function called to convert s on cache misses,
+                          raising an exception when conversion fails so
+                          that nothing is cached
+        """
+        digest = hashlib.sha256(
+            (self.converter_version + '\0' + s).encode('utf-8')).hexdigest()
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT content FROM markdown WHERE digest = ?',
+                (digest,)).fetchone()
+
+            if row is not None:
+                self.hits += 1
+                return row[0]
+
+            self.misses += 1
+
+        content = converter(s)
+
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO markdown VALUES (?, ?)',
+                (digest, content))
+            self._connection.commit()
+
+        return content
+
+    def report(self):
+        print("Markdown cache: {} hits, {} misses".format(self.hits,
+                                                         self.misses))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def get_converter_version():
+    """
+    :return: the version of the installed confluence2markdown package,
+             or 'unknown' when it cannot be found
+    """
+    try:
+        node_path = subprocess.check_output(['npm', 'root', '-g'],
+                                            universal_newlines=True).strip()
+
+        with open(os.path.join(node_path, 'confluence2markdown',
+                               'package.json')) as f:
+            return json.load(f)['version']
+    except (OSError, ValueError, KeyError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_shared_pool():
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ConversionServerPool()
+            atexit.register(_shared_pool.close)
+
+        return _shared_pool
@@ -0,0 +1,775 @@
+#!/usr/bin/env python3
+
+import calendar
+import collections
+import http.server
+import json
+import re
+import threading
+import time
+import urllib.parse
+
+# Date of the first synthetic issue, issues are then created one hour apart
+EPOCH = calendar.timegm((2014, 1, 1, 9, 0, 0))
+
+PRIORITIES = ['Blocker', 'Critical', 'Major', 'Minor', 'Trivial']
+RESOLUTIONS = ['Fixed', None, "Won't Fix", None, 'Duplicate']
+TYPES = ['Bug', 'Improvement', 'New Feature', 'Task']
+
+PARAGRAPH = ('h3. Context\n'
+             'The *scheduler* fails to start when the {{node.source}} '
+             'property is set, see [the documentation|'
+             'http://doc.activeeon.com] for details.\n'
+             '{code}\nscheduler.start(nodeSource);\n{code}\n'
+             '* first item\n* second item\n\n')
+
+
+class SyntheticProject:
+    """
+    JIRA project whose issues, comments and attachments are generated on
+    the fly from their index, so that large projects can be served without
+    being held in memory
+    """
+
+    def __init__(self, key, issues=1000, comments=5, attachments=1,
+                 attachment_size=64 * 1024, versions=5, text_size=2048,
+                 users=10):
+        """
+        :param issues: number of issues of the project
+        :param comments: number of comments per issue
+        :param attachments: number of attachments per issue
+        :param attachment_size: size in bytes of each attachment
+        :param versions: number of versions of the project
+        :param text_size: approximate size in bytes of descriptions and
+                          comment bodies
+        :param users: number of distinct reporters and assignees
+        """
+        self.key = key
+        self.issues = issues
+        self.comments = comments
+        self.attachments = attachments
+        self.attachment_size = attachment_size
+        self.versions = versions
+        self.text_size = text_size
+        self.users = users
+
+    def get_user(self, index):
+        name = 'user{}'.format(index % self.users)
+
+        return {'name': name, 'key': name,
+                'emailAddress': name + '@activeeon.com',
+                'displayName': 'User {}'.format(index % self.users)}
+
+    def get_text(self, seed):
+        text = 'Paragraph {}\n'.format(seed) + PARAGRAPH
+
+        return (text * (self.text_size // len(text) + 1))[:self.text_size]
+
+    def get_versions(self, base_url):
+        return [{'self': '{}/rest/api/2/version/{}'.format(base_url, i),
+                 'id': str(i),
+                 'name': '1.{}'.format(i),
+                 'description': 'Release 1.{}'.format(i),
+                 'released': i < self.versions - 1,
+                 'releaseDate': '2015-{:02d}-01'.format(i % 12 + 1)}
+                for i in range(self.versions)]
+
+    def get_comments(self, number):
+        return [{'id': str(number * 1000 + i),
+                 'author': self.get_user(number + i),
+                 'body': self.get_text(number * 1000 + i),
+                 'created': self._format_date(number, i + 1)}
+                for i in range(self.comments)]
+
+    def get_attachments(self, number, base_url, project_index):
+        result = []
+
+        for i in range(self.attachments):
+            attachment_id = self.get_attachment_id(project_index, number, i)
+            filename = 'attachment-{}.bin'.format(i)
+
+            result.append({
+                'self': '{}/rest/api/2/attachment/{}'.format(base_url,
+                                                             attachment_id),
+                'id': str(attachment_id),
+                'filename': filename,
+                'size': self.attachment_size,
+                'mimeType': 'application/octet-stream',
+                'created': self._format_date(number),
+                'content': '{}/secure/attachment/{}/{}'.format(
+                    base_url, attachment_id, filename)})
+
+        return result
+
+    @staticmethod
+    def get_attachment_id(project_index, number, index):
+        return (project_index * 10 ** 7 + number) * 100 + index
+
+    def get_attachment_data(self, attachment_id):
+        pattern = '{}\n'.format(attachment_id).encode('ascii')
+
+        return (pattern * (self.attachment_size // len(pattern) + 1))[
+               :self.attachment_size]
+
+    def get_issue(self, number, base_url, project_index):
+        """
+        :param number: number of the issue, from 1 to the number of issues
+        :return: the issue as serialized by the JIRA REST API, with all
+                 fields
+        """
+        key = '{}-{}'.format(self.key, number)
+        resolution = RESOLUTIONS[number % len(RESOLUTIONS)]
+        comments = self.get_comments(number)
+
+        return {
+            'id': str(project_index * 10 ** 7 + number),
+            'key': key,
+            'self': '{}/rest/api/2/issue/{}'.format(base_url, key),
+            'fields': {
+                'summary': 'Synthetic issue {}'.format(number),
+                'description': self.get_text(number),
+                'created': self._format_date(number),
+                'reporter': self.get_user(number),
+                'assignee': self.get_user(number + 1),
+                'priority': {'name': PRIORITIES[number % len(PRIORITIES)]},
+                'resolution': {'name': resolution}
+                if resolution is not None else None,
+                'issuetype': {'name': TYPES[number % len(TYPES)]},
+                'fixVersions': [{'name': '1.{}'.format(
+                    number % self.versions)}] if self.versions else [],
+                'comment': {'comments': comments, 'maxResults': len(comments),
+                            'total': len(comments), 'startAt': 0},
+                'attachment': self.get_attachments(number, base_url,
+                                                   project_index)
+            }
+        }
+
+    @staticmethod
+    def _format_date(number, offset=0):
+        return time.strftime('%Y-%m-%dT%H:%M:%S.000+0000', time.gmtime(
+            EPOCH + number * 3600 + offset * 60))
+
+
+class FakeServer:
+    """
+    HTTP server standing in for a remote API. Requests are dispatched to
+    the methods registered with route, in a thread per connection, after
+    an optional latency. Requests are counted per route
+    """
+
+    def __init__(self, latency=0):
+        """
+        :param latency: delay in seconds added before each response
+        """
+        self.latency = latency
+        self.requests = collections.Counter()
+        self.bytes_sent = 0
+
+        self._routes = []
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      _RequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake_server = self
+        self._thread = None
+
+        self.url = 'http://127.0.0.1:{}'.format(self._httpd.server_address[1])
+
+    def route(self, method, pattern, handler):
+        """
+        :param pattern: regular expression matching the whole request path,
+                        its groups are given as arguments to handler
+        :param handler: function called with a Request, followed by path
+                        groups, which returns a Response
+        """
+        self._routes.append((method, re.compile(pattern + '$'), handler))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def get_request_count(self):
+        with self._lock:
+            return sum(self.requests.values())
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+            self.bytes_sent = 0
+
+    def dispatch(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        for (method, pattern, handler) in self._routes:
+            match = pattern.match(request.path)
+
+            if match is not None and method == request.method:
+                with self._lock:
+                    self.requests[handler.__name__] += 1
+
+                return handler(request, *(urllib.parse.unquote(g)
+                                          for g in match.groups()))
+
+        with self._lock:
+            self.requests['not_found'] += 1
+
+        return Response(404, {'message': 'Not Found'})
+
+    def _record_sent(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+
+class Request:
+    def __init__(self, method, path, params, headers, body):
+        self.method = method
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.body = body
+
+    def get_param(self, name, default=None):
+        values = self.params.get(name)
+
+        return values[0] if values else default
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8')) if self.body else None
+
+
+class Response:
+    def __init__(self, status, body=None, headers=None):
+        """
+        :param body: bytes sent as is, or an object serialized to JSON
+        """
+        self.status = status
+        self.headers = dict(headers or {})
+
+        if body is None:
+            self.body = b''
+        elif isinstance(body, bytes):
+            self.body = body
+        else:
+            self.body = json.dumps(body).encode('utf-8')
+            self.headers.setdefault('Content-Type',
+                                    'application/json; charset=utf-8')
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    # keep-alive, as with the real APIs
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def _handle(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length > 0 else b''
+
+        fake_server = self.server.fake_server
+        response = fake_server.dispatch(
+            Request(method, url.path, urllib.parse.parse_qs(url.query),
+                    self.headers, body))
+
+        self.send_response(response.status)
+
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+
+        self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        self.wfile.write(response.body)
+
+        fake_server._record_sent(len(response.body))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeJiraServer(FakeServer):
+    """
+    Stand-in for the JIRA REST API serving synthetic projects: search,
+    issues, comments, versions and attachment contents
+    """
+
+    def __init__(self, projects, latency=0, max_results=100):
+        """
+        :param projects: SyntheticProject instances to serve
+        :param max_results: maximum number of issues per page of search
+                            results, as configured on JIRA servers
+        """
+        super().__init__(latency)
+
+        self.projects = collections.OrderedDict(
+            (p.key, p) for p in projects)
+        self.max_results = max_results
+
+        api = '/rest/api/2'
+        self.route('GET', api + '/serverInfo', self.get_server_info)
+        self.route('GET', api + '/field', self.get_fields)
+        self.route('GET', api + '/search', self.search)
+        self.route('POST', api + '/search', self.search)
+        self.route('GET', api + r'/issue/(\w+)-(\d+)', self.get_issue)
+        self.route('GET', api + r'/issue/(\w+)-(\d+)/comment',
+                   self.get_issue_comments)
+        self.route('GET', api + r'/project/(\w+)', self.get_project)
+        self.route('GET', api + r'/project/(\w+)/versions',
+                   self.get_project_versions)
+        self.route('GET', r'/secure/attachment/(\d+)/([^/]+)',
+                   self.get_attachment_content)
+
+    def get_server_info(self, request):
+        return Response(200, {'baseUrl': self.url, 'version': '7.0.0',
+                              'versionNumbers': [7, 0, 0],
+                              'deploymentType': 'Server',
+                              'buildNumber': 70000,
+                              'serverTitle': 'Fake JIRA'})
+
+    def get_fields(self, request):
+        return Response(200, [])
+
+    def search(self, request):
+        if request.method == 'POST':
+            query = request.json()
+            jql = query.get('jql', '')
+            start_at = int(query.get('startAt', 0))
+            max_results = int(query.get('maxResults', 50))
+            fields = query.get('fields')
+        else:
+            jql = request.get_param('jql', '')
+            start_at = int(request.get_param('startAt', 0))
+            max_results = int(request.get_param('maxResults', 50))
+            # fields are either comma separated or given as repeated
+            # parameters
+            fields = ','.join(request.params.get('fields', [])).split(',') \
+                if 'fields' in request.params else None
+
+        match = re.search(r'project\s*=\s*"?(\w+)', jql)
+        project = self.projects.get(match.group(1)) if match else None
+
+        if project is None:
+            return Response(400, {'errorMessages': [
+                "Unknown project in '{}'".format(jql)]})
+
+        max_results = min(max_results, self.max_results)
+        numbers = range(start_at + 1,
+                        min(start_at + max_results, project.issues) + 1)
+
+        issues = [self._filter_fields(self._get_issue(project, n), fields)
+                  for n in numbers]
+
+        return Response(200, {'startAt': start_at, 'maxResults': max_results,
+                              'total': project.issues, 'issues': issues})
+
+    def get_issue(self, request, key, number):
+        project = self.projects.get(key)
+
+        if project is None or not 0 < int(number) <= project.issues:
+            return Response(404, {'errorMessages': ['Issue does not exist']})
+
+        return Response(200, self._get_issue(project, int(number)))
+
+    def get_issue_comments(self, request, key, number):
+        response = self.get_issue(request, key, number)
+
+        if response.status != 200:
+            return response
+
+        return Response(200, json.loads(response.body.decode('utf-8'))[
+            'fields']['comment'])
+
+    def get_project(self, request, key):
+        if key not in self.projects:
+            return Response(404, {'errorMessages': ['No project found']})
+
+        return Response(200, {'self': '{}/rest/api/2/project/{}'.format(
+            self.url, key), 'id': str(list(self.projects).index(key)),
+                              'key': key, 'name': key.capitalize()})
+
+    def get_project_versions(self, request, key):
+        project = self.projects.get(key)
+
+        if project is None:
+            return Response(404, {'errorMessages': ['No project found']})
+
+        return Response(200, project.get_versions(self.url))
+
+    def get_attachment_content(self, request, attachment_id, filename):
+        project_index = int(attachment_id) // 100 // 10 ** 7
+
+        if project_index >= len(self.projects):
+            return Response(404)
+
+        project = list(self.projects.values())[project_index]
+        data = project.get_attachment_data(int(attachment_id))
+
+        match = re.match(r'bytes=(\d+)-$', request.headers.get('Range', ''))
+
+        if match is None:
+            return Response(200, data,
+                            {'Content-Type': 'application/octet-stream'})
+
+        offset = int(match.group(1))
+
+        return Response(206, data[offset:], {
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': 'bytes {}-{}/{}'.format(
+                offset, len(data) - 1, len(data))})
+
+    def _get_issue(self, project, number):
+        return project.get_issue(number, self.url,
+                                 list(self.projects).index(project.key))
+
+    @staticmethod
+    def _filter_fields(issue, fields):
+        if not fields or '*all' in fields:
+            return issue
+
+        issue['fields'] = {name: value for name, value in
+                           issue['fields'].items() if name in fields}
+
+        return issue
+
+
+class FakeGithubServer(FakeServer):
+    """
+    Stand-in for the Github API covering the calls made by PyGithub and by
+    the Comet client: organizations, repositories, labels, milestones and
+    the issue import endpoint. Imports stay pending for import_delay
+    seconds, then complete. A rate limit is enforced and reported with
+    the X-RateLimit-* headers
+    """
+
+    def __init__(self, latency=0, import_delay=1.0, failure_rate=0,
+                 rate_limit=None, rate_limit_window=3600, members=10):
+        """
+        :param import_delay: delay in seconds during which imports are
+                             pending
+        :param failure_rate: fraction of imports which fail
+        :param rate_limit: number of requests allowed per window, the quota
+                           is virtually unlimited when None
+        :param rate_limit_window: duration in seconds of rate limit windows
+        :param members: number of members of organizations
+        """
+        super().__init__(latency)
+
+        self.import_delay = import_delay
+        self.failure_rate = failure_rate
+        self.rate_limit = int(rate_limit) if rate_limit is not None \
+            else 10 ** 9
+        self.rate_limit_window = rate_limit_window
+        self.members = members
+
+        self._state_lock = threading.Lock()
+        self._repositories = {}
+        self._imports = {}
+        self._window_reset = 0
+        self._remaining = 0
+
+        repository = r'/repos/([^/]+)/([^/]+)'
+        self.route('GET', '/rate_limit', self.get_rate_limit)
+        self.route('GET', r'/orgs/([^/]+)', self.get_organization)
+        self.route('GET', r'/orgs/([^/]+)/members', self.get_members)
+        self.route('GET', r'/orgs/([^/]+)/repos', self.get_repositories)
+        self.route('POST', r'/orgs/([^/]+)/repos', self.create_repository)
+        self.route('GET', repository, self.get_repository)
+        self.route('GET', repository + '/labels', self.get_labels)
+        self.route('POST', repository + '/labels', self.create_label)
+        self.route('PATCH', repository + '/labels/([^/]+)', self.update_label)
+        self.route('DELETE', repository + '/labels/([^/]+)',
+                   self.delete_label)
+        self.route('GET', repository + '/milestones', self.get_milestones)
+        self.route('POST', repository + '/milestones', self.create_milestone)
+        self.route('POST', repository + '/import/issues', self.import_issue)
+        self.route('GET', repository + '/import/issues',
+                   self.list_issue_imports)
+        self.route('GET', repository + r'/import/issues/(\d+)',
+                   self.get_issue_import)
+
+    def dispatch(self, request):
+        if request.path == '/rate_limit':
+            # quota checks are not counted by Github
+            return self._add_rate_limit_headers(super().dispatch(request))
+
+        with self._state_lock:
+            now = time.time()
+
+            if now >= self._window_reset:
+                self._window_reset = int(now) + self.rate_limit_window
+                self._remaining = self.rate_limit
+
+            if self._remaining == 0:
+                exhausted = True
+            else:
+                self._remaining -= 1
+                exhausted = False
+
+        if exhausted:
+            with self._lock:
+                self.requests['rate_limited'] += 1
+
+            return self._add_rate_limit_headers(Response(403, {
+                'message': 'API rate limit exceeded',
+                'documentation_url': 'https://developer.github.com/v3/'
+                                     '#rate-limiting'}))
+
+        return self._add_rate_limit_headers(super().dispatch(request))
+
+    def _add_rate_limit_headers(self, response):
+        with self._state_lock:
+            response.headers.update({
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(self._remaining),
+                'X-RateLimit-Reset': str(self._window_reset)})
+
+        return response
+
+    def get_rate_limit(self, request):
+        with self._state_lock:
+            core = {'limit': self.rate_limit, 'remaining': self._remaining,
+                    'reset': self._window_reset}
+
+        return Response(200, {'resources': {'core': core, 'search': core,
+                                            'graphql': core},
+                              'rate': core})
+
+    def get_organization(self, request, organization):
+        return Response(200, self._get_organization(organization))
+
+    def get_members(self, request, organization):
+        return Response(200, [self._get_user('user{}'.format(i))
+                              for i in range(self.members)])
+
+    def get_repositories(self, request, organization):
+        with self._state_lock:
+            names = [name for (o, name) in self._repositories
+                     if o == organization]
+
+        return Response(200, [self._get_repository(organization, name)
+                              for name in names])
+
+    def create_repository(self, request, organization):
+        name = request.json()['name']
+
+        with self._state_lock:
+            if (organization, name) in self._repositories:
+                return Response(422, {'message': 'Validation Failed'})
+
+        return Response(201, self._get_repository(organization, name))
+
+    def get_repository(self, request, organization, name):
+        return Response(200, self._get_repository(organization, name))
+
+    def get_labels(self, request, organization, name):
+        state = self._get_state(organization, name)
+        url = self._get_repository_url(organization, name)
+
+        with self._state_lock:
+            labels = [{'url': url + '/labels/' + label, 'name': label,
+                       'color': color}
+                      for label, color in state['labels'].items()]
+
+        return Response(200, labels)
+
+    def create_label(self, request, organization, name):
+        state = self._get_state(organization, name)
+        data = request.json()
+
+        with self._state_lock:
+            if data['name'] in state['labels']:
+                return Response(422, {'message': 'Validation Failed'})
+
+            state['labels'][data['name']] = data['color']
+
+        return Response(201, data)
+
+    def update_label(self, request, organization, name, label):
+        state = self._get_state(organization, name)
+        data = request.json()
+
+        with self._state_lock:
+            if label not in state['labels']:
+                return Response(404, {'message': 'Not Found'})
+
+            state['labels'][label] = data['color']
+
+        return Response(200, {'name': label, 'color': data['color']})
+
+    def delete_label(self, request, organization, name, label):
+        state = self._get_state(organization, name)
+
+        with self._state_lock:
+            if state['labels'].pop(label, None) is None:
+                return Response(404, {'message': 'Not Found'})
+
+        return Response(204)
+
+    def get_milestones(self, request, organization, name):
+        state = self._get_state(organization, name)
+
+        with self._state_lock:
+            milestones = list(state['milestones'].values())
+
+        return Response(200, milestones)
+
+    def create_milestone(self, request, organization, name):
+        state = self._get_state(organization, name)
+        data = request.json()
+
+        with self._state_lock:
+            if data['title'] in state['milestones']:
+                return Response(422, {'message': 'Validation Failed'})
+
+            number = len(state['milestones']) + 1
+            milestone = {
+                'url': '{}/milestones/{}'.format(
+                    self._get_repository_url(organization, name), number),
+                'number': number, 'title': data['title'],
+                'state': data.get('state', 'open'),
+                'description': data.get('description'),
+                'due_on': data.get('due_on')}
+            state['milestones'][data['title']] = milestone
+
+        return Response(201, milestone)
+
+    def import_issue(self, request, organization, name):
+        state = self._get_state(organization, name)
+
+        try:
+            issue = request.json()['issue']
+            missing = [f for f in ('title', 'body', 'created_at')
+                       if f not in issue]
+        except (ValueError, KeyError, TypeError):
+            return Response(400, {'message': 'Problems parsing JSON'})
+
+        if missing:
+            return Response(422, {'message': 'Validation Failed', 'errors': [
+                {'resource': 'Issue', 'field': f, 'code': 'missing_field'}
+                for f in missing]})
+
+        with self._state_lock:
+            import_id = len(self._imports) + 1
+            failed = self.failure_rate > 0 and \
+                import_id % round(1 / self.failure_rate) == 0
+
+            if not failed:
+                state['issues'] += 1
+
+            self._imports[import_id] = {
+                'organization': organization, 'repository': name,
+                'created': time.time(), 'failed': failed,
+                'number': state['issues'] if not failed else None}
+
+        return Response(202, self._get_import(import_id))
+
+    def get_issue_import(self, request, organization, name, import_id):
+        with self._state_lock:
+            if int(import_id) not in self._imports:
+                return Response(404, {'message': 'Not Found'})
+
+        return Response(200, self._get_import(int(import_id)))
+
+    def list_issue_imports(self, request, organization, name):
+        since = request.get_param('since')
+        since = calendar.timegm(time.strptime(since, '%Y-%m-%dT%H:%M:%SZ')) \
+            if since is not None else 0
+        page = int(request.get_param('page', 1))
+        per_page = int(request.get_param('per_page', 30))
+
+        with self._state_lock:
+            ids = [i for i, entry in self._imports.items()
+                   if entry['organization'] == organization and
+                   entry['repository'] == name and
+                   entry['created'] >= since]
+
+        ids = ids[(page - 1) * per_page:page * per_page]
+
+        return Response(200, [self._get_import(i) for i in ids])
+
+    def _get_import(self, import_id):
+        with self._state_lock:
+            entry = self._imports[import_id]
+
+        repository_url = self._get_repository_url(entry['organization'],
+                                                  entry['repository'])
+        completed = time.time() - entry['created'] >= self.import_delay
+        updated = entry['created'] + (self.import_delay if completed else 0)
+
+        result = {
+            'id': import_id,
+            'status': 'pending' if not completed else
+            'failed' if entry['failed'] else 'imported',
+            'url': '{}/import/issues/{}'.format(repository_url, import_id),
+            'import_issues_url': repository_url + '/import/issues',
+            'repository_url': repository_url,
+            'created_at': self._format_date(entry['created']),
+            'updated_at': self._format_date(updated)
+        }
+
+        if completed and entry['failed']:
+            result['errors'] = [{'location': '/issue/title',
+                                 'resource': 'Issue', 'field': 'title',
+                                 'value': None, 'code': 'invalid'}]
+        elif completed:
+            result['issue_url'] = '{}/issues/{}'.format(repository_url,
+                                                        entry['number'])
+
+        return result
+
+    def _get_state(self, organization, name):
+        with self._state_lock:
+            return self._repositories.setdefault(
+                (organization, name),
+                {'labels': {}, 'milestones': {}, 'issues': 0})
+
+    def _get_organization(self, organization):
+        return {'login': organization, 'id': 1,
+                'url': '{}/orgs/{}'.format(self.url, organization),
+                'repos_url': '{}/orgs/{}/repos'.format(self.url, organization),
+                'members_url': '{}/orgs/{}/members{{/member}}'.format(
+                    self.url, organization)}
+
+    def _get_user(self, login):
+        return {'login': login, 'id': abs(hash(login)) % 10 ** 6,
+                'type': 'User',
+                'url': '{}/users/{}'.format(self.url, login)}
+
+    def _get_repository(self, organization, name):
+        # repositories are created on first access
+        self._get_state(organization, name)
+
+        return {'id': abs(hash((organization, name))) % 10 ** 6,
+                'name': name, 'full_name': organization + '/' + name,
+                'owner': self._get_organization(organization),
+                'url': self._get_repository_url(organization, name),
+                'has_issues': True, 'private': False}
+
+    def _get_repository_url(self, organization, name):
+        return '{}/repos/{}/{}'.format(self.url, organization, name)
+
+    @staticmethod
+    def _format_date(timestamp):
+        return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp))
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import time
+
+
+class GithubCache:
+    """
+    Cache of Github data listed by the migration (organization members,
+    repositories, labels and milestones) so that it is fetched once per run.
+    Listings may be persisted in a JSON file where they expire after ttl
+    seconds, which makes them reusable by later runs.
+    """
+
+    def __init__(self, github, rate_limiter, path=None, ttl=3600):
+        """
+        :param github: PyGithub instance used to fetch data
+        :param rate_limiter: scheduler the calls to Github go through
+        :param path: JSON file where listings are persisted, if any
+        :param ttl: delay in seconds after which persisted listings are
+                    fetched again
+        """
+        self.github = github
+        self.rate_limiter = rate_limiter
+        self.path = None
+        self.ttl = ttl
+
+        self._lock = threading.RLock()
+        self._objects = {}
+        self._entries = {}
+
+        if path is not None:
+            self.persist(path)
+
+    def persist(self, path):
+        """
+        Loads listings persisted in the given file, if any, and persists
+        listings there from now on
+        """
+        with self._lock:
+            if path == self.path:
+                return
+
+            self.path = path
+
+            if os.path.exists(path):
+                with open(path) as f:
+                    entries = json.load(f)
+
+                entries.update(self._entries)
+                self._entries = entries
+
+    def get_organization(self, organization_name):
+        return self._get_object(
+            ('organization', organization_name),
+            lambda: self.github.get_organization(organization_name))
+
+    def get_repository(self, organization_name, repository_name):
+        return self._get_object(
+            ('repository', organization_name, repository_name),
+            lambda: self.get_organization(organization_name).get_repo(
+                repository_name))
+
+    def get_members(self, organization_name):
+        """
+        :return: the logins of the members of an organization
+        """
+        return set(self._get_entry(
+            'members:' + organization_name,
+            lambda: [member.login for member in
+                     self.get_organization(organization_name).get_members()]))
+
+    def get_labels(self, organization_name, repository_name):
+        """
+        :return: a dict mapping label names of a repository to their color
+        """
+        return dict(self._get_entry(
+            self._get_repository_key('labels', organization_name,
+                                     repository_name),
+            lambda: {label.name: label.color for label in
+                     self.get_repository(organization_name,
+                                         repository_name).get_labels()}))
+
+    def get_milestones(self, organization_name, repository_name):
+        """
+        :return: a dict mapping milestone titles of a repository to their
+                 number
+        """
+        return dict(self._get_entry(
+            self._get_repository_key('milestones', organization_name,
+                                     repository_name),
+            lambda: {milestone.title: milestone.number for milestone in
+                     self.get_repository(
+                         organization_name,
+                         repository_name).get_milestones(state='all')}))
+
+    def set_labels(self, organization_name, repository_name, labels):
+        self._set_entry(
+            self._get_repository_key('labels', organization_name,
+                                     repository_name),
+            dict(labels))
+
+    def invalidate_labels(self, organization_name, repository_name):
+        self._invalidate_entry(
+            self._get_repository_key('labels', organization_name,
+                                     repository_name))
+
+    def set_milestones(self, organization_name, repository_name, milestones):
+        self._set_entry(
+            self._get_repository_key('milestones', organization_name,
+                                     repository_name),
+            dict(milestones))
+
+    def invalidate_milestones(self, organization_name, repository_name):
+        self._invalidate_entry(
+            self._get_repository_key('milestones', organization_name,
+                                     repository_name))
+
+    def invalidate_repository(self, organization_name, repository_name):
+        """
+        Forgets everything known about a repository once it has been
+        created or deleted
+        """
+        prefix = '{}/{}#'.format(organization_name, repository_name)
+
+        with self._lock:
+            self._objects.pop(
+                ('repository', organization_name, repository_name), None)
+
+            for key in list(self._entries):
+                if key.split(':', 1)[-1].startswith(prefix):
+                    del self._entries[key]
+
+            self._save()
+
+    def _get_repository_key(self, kind, organization_name, repository_name):
+        """
+        :return: the key of a listing of a repository, which includes its id
+                 so that listings of a deleted repository are never used
+                 for a new one with the same name
+        """
+        return '{}:{}/{}#{}'.format(
+            kind, organization_name, repository_name,
+            self.get_repository(organization_name, repository_name).id)
+
+    def _get_object(self, key, loader):
+        with self._lock:
+            if key in self._objects:
+                return self._objects[key]
+
+        # other threads are not held up by the request, nor by the rate
+        # limiter, the first object fetched is kept
+        value = self.rate_limiter.call(self.github, loader)
+
+        with self._lock:
+            return self._objects.setdefault(key, value)
+
+    def _get_entry(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and time.time() - entry['time'] <= self.ttl:
+                return entry['value']
+
+        value = self.rate_limiter.call(self.github, loader)
+        self._set_entry(key, value)
+
+        return value
+
+    def _set_entry(self, key, value):
+        with self._lock:
+            self._entries[key] = {'time': time.time(), 'value': value}
+            self._save()
+
+    def _invalidate_entry(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._save()
+
+    def _save(self):
+        if self.path is not None:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+
+            os.replace(self.path + '.tmp', self.path)
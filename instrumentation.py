@@ -0,0 +1,238 @@
+import cProfile
+import contextlib
+import functools
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+
+
+class Stage:
+    """
+    Durations and errors recorded for one kind of operation
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = []
+        self.errors = 0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, start, duration, error=False):
+        self.durations.append(duration)
+
+        if error:
+            self.errors += 1
+
+        end = start + duration
+        self.first_start = start if self.first_start is None \
+            else min(self.first_start, start)
+        self.last_end = end if self.last_end is None \
+            else max(self.last_end, end)
+
+    @staticmethod
+    def get_percentile(percentile, durations):
+        # nearest-rank method, durations are sorted
+        index = max(0, math.ceil(percentile / 100 * len(durations)) - 1)
+
+        return durations[index]
+
+    def to_dict(self):
+        durations = sorted(self.durations)
+        result = {'count': len(durations), 'errors': self.errors}
+
+        if durations:
+            active_time = self.last_end - self.first_start
+
+            result.update({
+                'total': sum(durations),
+                'mean': sum(durations) / len(durations),
+                'p50': Stage.get_percentile(50, durations),
+                'p90': Stage.get_percentile(90, durations),
+                'p99': Stage.get_percentile(99, durations),
+                'max': durations[-1],
+                # operations per second while the stage was active
+                'throughput': len(durations) / active_time
+                if active_time > 0 else None
+            })
+
+        return result
+
+    def __str__(self):
+        d = self.to_dict()
+
+        if d['count'] == 0:
+            return "{}: {} errors".format(self.name, d['errors'])
+
+        return "{}: {} calls, {} errors, p50 {:.0f} ms, p90 {:.0f} ms, p99 {:.0f} ms, max {:.0f} ms, {:.1f} s in total".format(
+            self.name, d['count'], d['errors'], 1000 * d['p50'],
+            1000 * d['p90'], 1000 * d['p99'], 1000 * d['max'], d['total'])
+
+
+class Recorder:
+    """
+    Collects timings and counters of the stages of a run, from any thread
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+
+        self._lock = threading.Lock()
+
+    def record(self, name, start, duration, error=False):
+        """
+        :param start: time.monotonic() value at which the operation started
+        :param duration: duration of the operation in seconds
+        """
+        with self._lock:
+            stage = self.stages.get(name)
+
+            if stage is None:
+                stage = self.stages[name] = Stage(name)
+
+            stage.record(start, duration, error)
+
+    def record_error(self, name):
+        """
+        Records an error for an operation which did not raise an exception
+        """
+        with self._lock:
+            stage = self.stages.get(name)
+
+            if stage is None:
+                stage = self.stages[name] = Stage(name)
+
+            stage.errors += 1
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """
+        Records the duration of the enclosed block, exceptions are counted
+        as errors
+        """
+        start = time.monotonic()
+        error = False
+
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(name, start, time.monotonic() - start, error)
+
+    def get_report(self, command=None):
+        with self._lock:
+            return {
+                'command': command,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                         time.localtime(self.started)),
+                'wall_time': time.time() - self.started,
+                'stages': {name: stage.to_dict()
+                           for name, stage in sorted(self.stages.items())},
+                'counters': dict(sorted(self.counters.items()))
+            }
+
+    def report(self):
+        with self._lock:
+            for _, stage in sorted(self.stages.items()):
+                print(stage)
+
+            for name, value in sorted(self.counters.items()):
+                print("{}: {}".format(name, value))
+
+    def write_report(self, path, command=None):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.get_report(command), f, indent=2)
+
+        # the report of a previous run is only replaced once complete
+        os.replace(path + '.tmp', path)
+
+
+recorder = Recorder()
+
+
+def timed(name):
+    return recorder.timed(name)
+
+
+def record_error(name):
+    recorder.record_error(name)
+
+
+def count(name, value=1):
+    recorder.count(name, value)
+
+
+def instrumented(name):
+    """
+    Decorator recording the duration of each call of a function in the
+    given stage
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with recorder.timed(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextlib.contextmanager
+def profile(path):
+    """
+    Profiles the enclosed block with cProfile when path is not None, along
+    with the threads it starts. Stats of all threads are merged and written
+    to path, to be read with pstats
+    """
+    if path is None:
+        yield
+        return
+
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def start_thread_profiler(frame, event, arg):
+        # called on the first event of each new thread, whose own profiler
+        # then replaces this function
+        sys.setprofile(None)
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+        except ValueError:
+            # since Python 3.12, the profiler of the calling thread already
+            # covers all threads
+            return
+
+        with lock:
+            profilers.append(profiler)
+
+    threading.setprofile(start_thread_profiler)
+    profilers[0].enable()
+
+    try:
+        yield
+    finally:
+        profilers[0].disable()
+        threading.setprofile(None)
+
+        with lock:
+            stats = pstats.Stats(*profilers)
+
+        stats.dump_stats(path)
+
+        print("Profile of {} threads written to '{}'".format(len(profilers),
+                                                            path))
@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+
+SUBMITTED = 'submitted'
+IMPORTED = 'imported'
+FAILED = 'failed'
+
+
+class ImportJournal:
+    """
+    Persistent record of issue imports, mapping each JIRA key to its Comet
+    import id, Github issue number and import status. It allows an
+    interrupted import to be resumed without importing issues twice.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS issues '
+            '(jira_key TEXT PRIMARY KEY, import_id INTEGER, '
+            'github_number INTEGER, status TEXT NOT NULL)')
+        self._connection.commit()
+
+    def get_status(self, jira_key):
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT status FROM issues WHERE jira_key = ?',
+                (jira_key,)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def get_submitted(self, jira_key_prefix):
+        """
+        :return: (JIRA key, import id) pairs of the imports submitted for a
+                 project whose outcome is unknown
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT jira_key, import_id FROM issues '
+                'WHERE status = ? AND jira_key LIKE ?',
+                (SUBMITTED, jira_key_prefix + '-%')).fetchall()
+
+    def set_submitted(self, jira_key, import_id):
+        self._update(jira_key, import_id, None, SUBMITTED)
+
+    def set_imported(self, jira_key, import_id, github_number=None):
+        self._update(jira_key, import_id, github_number, IMPORTED)
+
+    def set_failed(self, jira_key, import_id=None):
+        self._update(jira_key, import_id, None, FAILED)
+
+    def _update(self, jira_key, import_id, github_number, status):
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?)',
+                (jira_key, import_id, github_number, status))
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
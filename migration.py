@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
+import multiprocessing
+import signal
 import tempfile
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import argh
 from github.GithubObject import NotSet
@@ -10,6 +16,12 @@ from attachments import Attachments
 import utility
 import buhtig
 import arij
+import confluence
+import githubcache
+import instrumentation
+import journal
+import ratelimit
+import snapshot
 
 __author__ = 'lpellegr'
 
@@ -18,11 +30,50 @@ import os
 import re
 
 
+# Size of packs above which gc reuses existing deltas instead of
+# recomputing them all
+GC_RECOMPUTE_DELTAS_MAX_SIZE = 1024 * 1024 * 1024
+
+BFG_BATCH_LAUNCHER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  'BfgBatch.java')
+
+# Labels set on Github repositories, in place of default ones, to which
+# the priority, resolution and type of imported issues are mapped
+ISSUE_LABELS = {
+    # labels related to issue priority
+    'priority:blocker': 'ff6666',
+    'priority:critical': 'ff8080',
+    'priority:major': 'ff9999',
+    'priority:minor': 'ffb2b2',
+    'priority:trivial': 'ffcccc',
+    # labels related to issue resolution
+    'resolution:cannot-reproduce': 'bfe5bf',
+    'resolution:duplicate': 'bfe5bf',
+    'resolution:fixed': 'bfe5bf',
+    'resolution:incomplete': 'bfe5bf',
+    'resolution:invalid': 'bfe5bf',
+    'resolution:wont-fix': 'bfe5bf',
+    # labels related to issue type
+    'type:bug': 'c7def8',
+    'type:improvement': 'c7def8',
+    'type:new-feature': 'c7def8',
+    'type:story': 'c7def8',
+    'type:story-item': 'c7def8',
+    'type:task': 'c7def8',
+    'type:task-related-bug': 'c7def8'
+}
+
+
 class Migration:
     def __init__(self):
         self.github = Github(github_authentication_token)
-        self.github_organization = self.github.get_organization(
+        self.rate_limiter = ratelimit.RateLimiter()
+        self.github_cache = githubcache.GithubCache(self.github,
+                                                    self.rate_limiter)
+        self.github_organization = self.github_cache.get_organization(
             github_organization_name)
+        self._repository_locks = {}
+        self._repository_locks_lock = threading.Lock()
         self.repositories = \
             self.load_data("mapping-repositories.txt", lambda data,
                                                               chunks: self._create_repository_entries(
@@ -37,28 +88,60 @@ class Migration:
 
         data.append(RepositoryMappingEntry(chunks[0], github_repo_name))
 
+    def _call_github(self, action):
+        return self.rate_limiter.call(self.github, action)
+
     def get_repository(self, github_repo_name):
-        return self.github_organization.get_repo(github_repo_name)
+        return self._call_github(
+            lambda: self.github_organization.get_repo(github_repo_name))
+
+    def rate_limit(self, interval=5):
+        """
+        Prints the Github API quota left for the token every interval
+        seconds, along with the rate at which it is consumed
+        """
+        previous = None
+
+        while True:
+            core = self.github.get_rate_limit().core
+            now = time.time()
+
+            if previous is not None and previous[1] >= core.remaining:
+                throughput = (previous[1] - core.remaining) / (now - previous[0])
+            else:
+                throughput = 0
+
+            print("{}/{} remaining, reset at {}, {:.2f} requests/s".format(
+                core.remaining, core.limit, core.reset, throughput))
+
+            previous = (now, core.remaining)
+            time.sleep(interval)
 
     def create_repositories(self):
         [self.create_repository(r.github_repo_name) for r in self.repositories]
 
     def create_repository(self, github_repo_name):
         utility.execute(
-            lambda: self.github_organization.create_repo(
-                github_repo_name, has_wiki=False, has_issues=False,
-                has_downloads=True),
+            lambda: self._call_github(
+                lambda: self.github_organization.create_repo(
+                    github_repo_name, has_wiki=False, has_issues=False,
+                    has_downloads=True)),
             "Repository " + github_repo_name + " created",
             "Cannot create repository '" + github_repo_name + "' since it already exists")
+        self.github_cache.invalidate_repository(github_organization_name,
+                                                github_repo_name)
 
     def delete_repositories(self):
         [self.delete_repository(r.github_repo_name) for r in self.repositories]
 
     def delete_repository(self, github_repo_name):
         utility.execute(
-            lambda: self.get_repository(github_repo_name).delete(),
+            lambda: self._call_github(
+                self.get_repository(github_repo_name).delete),
             "Repository " + github_repo_name + " deleted",
             "Cannot delete repository '" + github_repo_name + "' since it does not exist")
+        self.github_cache.invalidate_repository(github_organization_name,
+                                                github_repo_name)
 
     def edit_repositories(self, description=None, homepage=None, private=None,
                           has_issues=None, has_wiki=None, default_branch=None):
@@ -79,8 +162,10 @@ class Migration:
         default_branch = Migration.transform_string(default_branch)
 
         utility.execute(
-            lambda: repo.edit(github_repo_name, description, homepage, private,
-                              has_issues, has_wiki, default_branch),
+            lambda: self._call_github(
+                lambda: repo.edit(github_repo_name, description, homepage,
+                                  private, has_issues, has_wiki,
+                                  default_branch)),
             "Repository " + github_repo_name + " edited",
             "Cannot edit repository '" + github_repo_name + "' since it does not exist")
 
@@ -105,98 +190,370 @@ class Migration:
                     ow2_repo_name),
                 repo_dir)
 
-            if utility.execute_command(command) is 0:
+            if utility.execute_command(command) == 0:
                 print("Repository '{}' has been cloned".format(ow2_repo_name))
+                return True
             else:
                 print("Error occurred while cloning '{}'".format(ow2_repo_name))
+                return False
         else:
+            tips = Migration.get_ref_tips(repo_dir)
+
             if utility.execute_command(
-                    "cd {}; git remote update".format(repo_dir)) is 0:
-                print("Repository '{}' has been updated".format(ow2_repo_name))
+                    "cd {}; git remote update --prune".format(repo_dir)) == 0:
+                updated_tips = Migration.get_ref_tips(repo_dir)
+
+                print("Repository '{}' has been updated: {} refs added, {} updated, {} deleted".format(
+                    ow2_repo_name,
+                    len(updated_tips.keys() - tips.keys()),
+                    len([ref for ref in updated_tips.keys() & tips.keys()
+                         if updated_tips[ref] != tips[ref]]),
+                    len(tips.keys() - updated_tips.keys())))
+                return True
             else:
                 print(
                     "Error occurred while updating '{}'".format(ow2_repo_name))
+                return False
 
-    def gc_repositories(self, working_dir=None):
+    def gc_repositories(self, working_dir=None, strategy='auto'):
         if working_dir is None:
             raise ValueError("Undefined argument --working-dir")
 
-        [self.gc_repository(r.ow2_repo_name, working_dir) for r in
+        [self.gc_repository(r.ow2_repo_name, working_dir, strategy) for r in
          self.repositories]
 
     @staticmethod
-    def gc_repository(ow2_repo_name, working_dir):
+    def gc_repository(ow2_repo_name, working_dir, strategy='auto'):
+        """
+        :param strategy: 'aggressive' runs an aggressive gc followed by a full
+                         repack, whereas 'auto' picks a single repack from the
+                         repository size and pack count
+        """
         repo_dir = working_dir + os.sep + ow2_repo_name
-        command = "cd {} && git reflog expire --expire=now --all && git gc --aggressive --prune=now && git repack -a -d -l".format(
-            repo_dir)
+        stats = Migration.get_repository_stats(repo_dir)
+        size = Migration.get_repository_size(repo_dir)
+        start = time.monotonic()
+
+        if strategy == 'aggressive':
+            command = "cd {} && git reflog expire --expire=now --all && git gc --aggressive --prune=now && git repack -a -d -l".format(
+                repo_dir)
+        elif strategy == 'auto':
+            command = Migration._select_gc_command(repo_dir, stats)
+        else:
+            raise ValueError("Unknown gc strategy '{}'".format(strategy))
+
+        if command is None:
+            print("Repository '{}' is already packed, skipping gc".format(
+                ow2_repo_name))
+            return True
 
         print("Executing command '{}'".format(command))
 
-        if utility.execute_command(command) is 0:
+        if utility.execute_command(command) == 0:
             print(
-                "Repository '{}' has been garbage collected".format(
-                    ow2_repo_name))
+                "Repository '{}' has been garbage collected: {} -> {} bytes in {:.1f}s".format(
+                    ow2_repo_name, size,
+                    Migration.get_repository_size(repo_dir),
+                    time.monotonic() - start))
+            return True
         else:
             print("Error occurred while garbage collecting '{}'".format(
                 ow2_repo_name))
+            return False
+
+    @staticmethod
+    def _select_gc_command(repo_dir, stats):
+        """
+        :return: the command to garbage collect a repository or None if it
+                 already consists of a single pack
+        """
+        if stats.get('count', 0) == 0 and stats.get('packs', 0) <= 1:
+            return None
+
+        # deltas are only recomputed from scratch, as with an aggressive gc,
+        # for repositories small enough for it to be affordable. The bitmap
+        # index speeds up counting objects for the mirror push
+        options = '-f --window=250 --depth=50' \
+            if stats.get('size-pack', 0) * 1024 < GC_RECOMPUTE_DELTAS_MAX_SIZE \
+            else '--window=50 --depth=50'
+
+        return "cd {} && git reflog expire --expire=now --all && git repack -a -d -l {} --threads={} --write-bitmap-index && git prune --expire=now".format(
+            repo_dir, options, os.cpu_count() or 1)
+
+    def prune_repositories(self, working_dir=None, mode='bfg'):
+        """
+        Removes the files matching filters from the history of repositories
+
+        :param mode: 'bfg' runs BFG once per repository, 'bfg-batch' runs
+                     BFG on all repositories within a single JVM and
+                     'filter-repo' relies on git filter-repo instead of BFG.
+                     Unlike BFG, filter-repo also removes matching files from
+                     the latest commit
+        """
+        if working_dir is None:
+            raise ValueError("Undefined argument --working-dir")
+
+        filters = self._load_filters_mapping()
 
-    def prune_repositories(self, working_dir=None):
-        filters = self.load_data("mapping-filters.txt",
-                                 lambda data, chunks: data.append(
-                                     FilterMappingEntry(chunks[0], chunks[1])))
-        for f in filters:
-            self.prune_repository(f, working_dir)
+        if mode == 'bfg':
+            for f in filters:
+                self.prune_repository(f, working_dir)
+        elif mode == 'bfg-batch':
+            self.prune_repositories_in_batch(filters, working_dir)
+        elif mode == 'filter-repo':
+            for f in filters:
+                self.filter_repository(f, working_dir)
+        else:
+            raise ValueError("Unknown prune mode '{}'".format(mode))
+
+    def _load_filters_mapping(self):
+        return self.load_data("mapping-filters.txt",
+                              lambda data, chunks: data.append(
+                                  FilterMappingEntry(chunks[0], chunks[1])))
 
     @staticmethod
     def prune_repository(entry, working_dir):
         repo_dir = working_dir + os.sep + entry.ow2_repo_name
+        size = Migration.get_repository_size(repo_dir)
         command = "java -jar {} --delete-files {} {}".format(bfg_jar_path,
                                                              entry.bfg_filter,
                                                              repo_dir)
 
         print("Executing command '{}'".format(command))
 
-        if utility.execute_command(command) is 0:
-            command = \
-                'cd {} && git reflog expire --expire=now --all && git gc --prune=now --aggressive'.format(
-                    repo_dir)
+        if utility.execute_command(command) == 0:
+            return Migration._compact_pruned_repository(entry, working_dir,
+                                                        size)
+
+        print(
+            "Error occurred while pruning '{}'".format(entry.ow2_repo_name))
+        return False
+
+    @staticmethod
+    def prune_repositories_in_batch(entries, working_dir):
+        """
+        Runs BFG on repositories sharing the same filter within a single
+        JVM, so that JVM startup and warmup are paid once per filter.
+        Repositories the batch has not processed are pruned one by one
+        """
+        entries_per_filter = {}
+
+        for entry in entries:
+            entries_per_filter.setdefault(entry.bfg_filter, []).append(entry)
+
+        for bfg_filter, group in entries_per_filter.items():
+            repo_dirs = [working_dir + os.sep + e.ow2_repo_name for e in group]
+            sizes = [Migration.get_repository_size(d) for d in repo_dirs]
+            command = "java -cp {} {} {} {}".format(
+                bfg_jar_path, BFG_BATCH_LAUNCHER, bfg_filter,
+                ' '.join(repo_dirs))
 
             print("Executing command '{}'".format(command))
 
-            if utility.execute_command(command) is 0:
-                print(
-                    "Repository '{}' has been pruned".format(
+            output = utility.command_output(command, check=False) or ''
+            pruned = set(line.split(' ', 1)[1]
+                         for line in output.splitlines()
+                         if line.startswith('BFG-BATCH-OK '))
+
+            for entry, repo_dir, size in zip(group, repo_dirs, sizes):
+                if repo_dir in pruned:
+                    Migration._compact_pruned_repository(entry, working_dir,
+                                                         size)
+                else:
+                    print("Batch has not pruned '{}', pruning it alone".format(
                         entry.ow2_repo_name))
-        else:
-            print(
-                "Error occurred while pruning '{}'".format(entry.ow2_repo_name))
+                    Migration.prune_repository(entry, working_dir)
+
+    @staticmethod
+    def filter_repository(entry, working_dir):
+        repo_dir = working_dir + os.sep + entry.ow2_repo_name
+        size = Migration.get_repository_size(repo_dir)
+
+        # BFG filters match file names whereas filter-repo globs match
+        # paths from the repository root
+        path_globs = []
+
+        for glob in expand_braces(entry.bfg_filter.strip('\'"')):
+            path_globs.append("--path-glob '{}'".format(glob))
+
+            if not glob.startswith('*'):
+                path_globs.append("--path-glob '*/{}'".format(glob))
+
+        command = "cd {} && git filter-repo --force --invert-paths {}".format(
+            repo_dir, ' '.join(path_globs))
+
+        print("Executing command '{}'".format(command))
+
+        if utility.execute_command(command) == 0:
+            # filter-repo expires reflogs and repacks on its own
+            Migration._report_saved_size(entry, repo_dir, size)
+            return True
+
+        print(
+            "Error occurred while pruning '{}'".format(entry.ow2_repo_name))
+        return False
+
+    @staticmethod
+    def _compact_pruned_repository(entry, working_dir, size):
+        repo_dir = working_dir + os.sep + entry.ow2_repo_name
+        command = \
+            'cd {} && git reflog expire --expire=now --all && git gc --prune=now --aggressive'.format(
+                repo_dir)
+
+        print("Executing command '{}'".format(command))
+
+        if utility.execute_command(command) == 0:
+            Migration._report_saved_size(entry, repo_dir, size)
+            return True
+
+        print(
+            "Error occurred while pruning '{}'".format(entry.ow2_repo_name))
+        return False
+
+    @staticmethod
+    def _report_saved_size(entry, repo_dir, size):
+        print("Repository '{}' has been pruned, {} bytes saved".format(
+            entry.ow2_repo_name, size - Migration.get_repository_size(repo_dir)))
+
+    @staticmethod
+    def get_repository_size(repo_dir):
+        """
+        :return: the size in bytes of loose and packed objects of a repository
+        """
+        stats = Migration.get_repository_stats(repo_dir)
+
+        return (stats.get('size', 0) + stats.get('size-pack', 0)) * 1024
+
+    @staticmethod
+    def get_ref_tips(repo_dir):
+        """
+        :return: a dict mapping the name of each ref of a repository to
+                 the object it points to
+        """
+        output = utility.command_output(
+            "cd {} && git for-each-ref --format='%(objectname) %(refname)'".format(
+                repo_dir)) or ''
+
+        return {ref: sha for (sha, ref) in
+                (line.split(' ', 1) for line in output.splitlines())}
+
+    @staticmethod
+    def get_repository_stats(repo_dir):
+        """
+        :return: the statistics given by git count-objects, sizes are in KiB
+        """
+        output = utility.command_output(
+            "cd {} && git count-objects -v".format(repo_dir)) or ''
+
+        return {key: int(value) for (key, value) in
+                (line.split(': ', 1) for line in output.splitlines())}
 
     def import_repositories(self, working_dir=None):
         if working_dir is None:
             raise ValueError("Undefined argument --working-dir")
 
+        [self.import_repository(r, working_dir) for r in
+         self._sort_repositories_for_import()]
+
+    def _sort_repositories_for_import(self):
         # Sort repositories by Github name, in reverse order. This way
         # they will be imported so that at the end they appear
         # lexicographically sorted on Github
-        sorted_repositories = sorted(self.repositories,
-                                     key=lambda r: r.github_repo_name,
-                                     reverse=True)
-        [self.import_repository(r, working_dir) for r in sorted_repositories]
+        return sorted(self.repositories,
+                      key=lambda r: r.github_repo_name,
+                      reverse=True)
+
+    def migrate_repositories(self, working_dir=None, jobs=4,
+                             incremental=False):
+        """
+        Clones, garbage collects, prunes and imports repositories to Github.
+        Up to jobs repositories go through the first stages concurrently,
+        each one on its own schedule, whereas imports are performed one by
+        one in the same order as with import-repositories.
+
+        Ref tips are recorded after each stage in the working dir. In
+        incremental mode, repositories whose source refs have not changed
+        since their last import skip the remaining stages, and only the
+        refs updated since the last import are pushed
+        """
+        if working_dir is None:
+            raise ValueError("Undefined argument --working-dir")
+
+        filters = {f.ow2_repo_name: f for f in self._load_filters_mapping()}
+        sorted_repositories = self._sort_repositories_for_import()
+        state = SyncState(os.path.join(working_dir, 'sync-state.json'))
+
+        with ProcessPoolExecutor(
+                max_workers=jobs,
+                mp_context=multiprocessing.get_context('fork')) as executor:
+            # repositories are submitted in import order so that the next
+            # one to import is always prepared first
+            futures = [executor.submit(
+                prepare_repository, r.ow2_repo_name,
+                filters.get(r.ow2_repo_name), working_dir,
+                state.get(r.ow2_repo_name, 'pushed-source')
+                if incremental else None)
+                for r in sorted_repositories]
+
+            for r, future in zip(sorted_repositories, futures):
+                result = future.result()
+
+                if result is None:
+                    print("Repository '{}' is not imported since it could not be prepared".format(
+                        r.ow2_repo_name))
+                    continue
+
+                (source_tips, tips) = result
+                state.set(r.ow2_repo_name, 'clone', source_tips)
+
+                if tips is None:
+                    continue
+
+                state.set(r.ow2_repo_name, 'prune', tips)
+
+                if self.import_repository(
+                        r, working_dir,
+                        state.get(r.ow2_repo_name, 'push')
+                        if incremental else None):
+                    state.set(r.ow2_repo_name, 'push', tips)
+                    state.set(r.ow2_repo_name, 'pushed-source', source_tips)
 
     @staticmethod
-    def import_repository(entry, working_dir):
+    def import_repository(entry, working_dir, pushed_tips=None):
+        """
+        :param pushed_tips: ref tips pushed by the last import, if known,
+                            in which case only the refs updated since then
+                            are pushed
+        """
         repo_dir = working_dir + os.sep + entry.ow2_repo_name
         github_url = "git@github.com:{}/{}.git".format(github_organization_name,
                                                        entry.github_repo_name)
 
-        if utility.execute_command(
-                "cd {} && git push --mirror {}".format(repo_dir,
-                                                       github_url)) is 0:
+        if pushed_tips is None:
+            command = "cd {} && git push --mirror {}".format(repo_dir,
+                                                            github_url)
+        else:
+            tips = Migration.get_ref_tips(repo_dir)
+            refspecs = ['+{0}:{0}'.format(ref) for (ref, sha) in tips.items()
+                        if pushed_tips.get(ref) != sha] + \
+                       [':' + ref for ref in pushed_tips if ref not in tips]
+
+            if not refspecs:
+                print("Repository '{}' is already up to date on Github".format(
+                    entry.ow2_repo_name))
+                return True
+
+            command = "cd {} && git push {} {}".format(repo_dir, github_url,
+                                                       ' '.join(refspecs))
+
+        if utility.execute_command(command) == 0:
             print(
                 "Repository '{}' has been imported".format(entry.ow2_repo_name))
+            return True
         else:
             print("Error occurred while importing '{}' to Github".format(
                 entry.ow2_repo_name))
+            return False
 
     @staticmethod
     def load_data(file, appender):
@@ -214,11 +571,12 @@ class Migration:
 
     def import_attachments(self, jira_endpoint,
                            github_attachments_repository_name,
-                           working_dir=None):
+                           working_dir=None, concurrency=8):
         attachments = Attachments(jira_endpoint,
                                   github_organization_name,
                                   github_attachments_repository_name,
-                                  working_dir=working_dir)
+                                  working_dir=working_dir,
+                                  concurrency=concurrency)
 
         for entry in self._load_issues_mapping():
             self.import_attachments_for_project(attachments,
@@ -230,21 +588,122 @@ class Migration:
     def import_attachments_for_project(attachments, jira_project_key):
         attachments.fetch_from_jira(jira_project_key)
 
+    def export_snapshot(self, jira_endpoint, snapshot_dir):
+        """
+        Writes a snapshot of each JIRA project to migrate in snapshot_dir,
+        from which issues can then be imported with --snapshot-dir
+        """
+        if not os.path.exists(snapshot_dir):
+            os.makedirs(snapshot_dir)
+
+        for entry in self._load_issues_mapping():
+            path = snapshot.get_snapshot_path(snapshot_dir,
+                                              entry.jira_project_key)
+            count = snapshot.export_project(
+                arij.JiraProject(jira_endpoint, entry.jira_project_key), path)
+
+            print("Snapshot of JIRA project {} written to '{}': {} issues".format(
+                entry.jira_project_key, path, count))
+
     def import_issues(self, jira_endpoint, github_attachments_repository_name,
-                      default_assignee=None):
+                      default_assignee=None, concurrency=4, working_dir=None,
+                      snapshot_dir=None, jobs=4):
+        """
+        Imports the issues of the JIRA projects defined in
+        mapping-issues.txt. Up to jobs projects are imported concurrently,
+        largest ones first, and share the Github API quota equally. Labels
+        and milestones of a repository are set up by one project at a time
+
+        :param snapshot_dir: directory of the snapshots written by
+                             export-snapshot, from which issues are read
+                             instead of JIRA
+        :param jobs: number of projects imported concurrently
+        """
         mapping_usernames = self._load_usernames_mapping()
+        projects = self._sort_projects_for_import(jira_endpoint, snapshot_dir)
+        (markdown_cache, import_journal) = self._open_import_stores(
+            working_dir)
+        failed = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                futures = [(entry, executor.submit(
+                    self._import_project_issues, jira_project,
+                    entry.github_project_name,
+                    github_attachments_repository_name, mapping_usernames,
+                    default_assignee, concurrency, markdown_cache,
+                    import_journal))
+                           for (entry, jira_project) in projects]
+
+                for (entry, future) in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        utility.error(
+                            "Error while importing issues from JIRA project {}: {}".format(
+                                entry.jira_project_key, e))
+                        failed.append(entry.jira_project_key)
+        finally:
+            markdown_cache.report()
+            markdown_cache.close()
+            import_journal.close()
+
+        if failed:
+            utility.error("Issues of JIRA projects {} have to be imported again".format(
+                ', '.join(failed)))
+
+    def _sort_projects_for_import(self, jira_endpoint, snapshot_dir=None):
+        """
+        :return: (mapping entry, JIRA project) pairs, ordered by decreasing
+                 number of issues so that the largest projects do not delay
+                 the end of the import
+        """
+        projects = []
 
         for entry in self._load_issues_mapping():
-            print(
-                "Importing issues from JIRA project {} to Github repository named '{}'".format(
-                    entry.jira_project_key, entry.github_project_name))
+            jira_project = self._create_jira_project(
+                jira_endpoint, entry.jira_project_key, snapshot_dir)
+            count = jira_project.get_issue_count()
+
+            print("JIRA project {} has {} issues".format(
+                entry.jira_project_key, count))
 
-            self.import_issues_for_project(jira_endpoint,
-                                           entry.jira_project_key,
-                                           entry.github_project_name,
-                                           github_attachments_repository_name,
-                                           mapping_usernames,
-                                           default_assignee)
+            projects.append((count, entry, jira_project))
+
+        projects.sort(key=lambda p: p[0], reverse=True)
+
+        return [(entry, jira_project) for (_, entry, jira_project) in projects]
+
+    @staticmethod
+    def _create_jira_project(jira_endpoint, jira_project_key,
+                             snapshot_dir=None):
+        if snapshot_dir is not None:
+            return snapshot.SnapshotProject(
+                snapshot.get_snapshot_path(snapshot_dir, jira_project_key))
+
+        return arij.JiraProject(jira_endpoint, jira_project_key)
+
+    def _open_import_stores(self, working_dir):
+        """
+        :return: the markdown cache and the import journal kept in
+                 working_dir, the Github cache being persisted there too
+        """
+        if working_dir is not None and not os.path.exists(working_dir):
+            os.makedirs(working_dir)
+
+        self.github_cache.persist(
+            os.path.join(working_dir or os.curdir, 'github-cache.json'))
+        markdown_cache = confluence.MarkdownCache(
+            os.path.join(working_dir or os.curdir, 'markdown-cache.sqlite'))
+        import_journal = journal.ImportJournal(
+            os.path.join(working_dir or os.curdir, 'import-journal.sqlite'))
+
+        return markdown_cache, import_journal
+
+    def _get_repository_lock(self, github_repo_name):
+        with self._repository_locks_lock:
+            return self._repository_locks.setdefault(github_repo_name,
+                                                     threading.Lock())
 
     def _load_issues_mapping(self):
         return self.load_data("mapping-issues.txt",
@@ -264,42 +723,53 @@ class Migration:
                                   github_project_name,
                                   github_attachments_repository_name=None,
                                   mapping_usernames=None,
-                                  default_assignee=None):
-        jira_project = arij.JiraProject(jira_endpoint, jira_project_key)
+                                  default_assignee=None,
+                                  concurrency=4,
+                                  working_dir=None,
+                                  snapshot_dir=None):
+        jira_project = self._create_jira_project(jira_endpoint,
+                                                 jira_project_key,
+                                                 snapshot_dir)
+        (markdown_cache, import_journal) = self._open_import_stores(
+            working_dir)
+
+        try:
+            self._import_project_issues(jira_project, github_project_name,
+                                        github_attachments_repository_name,
+                                        mapping_usernames, default_assignee,
+                                        concurrency, markdown_cache,
+                                        import_journal)
+        finally:
+            markdown_cache.report()
+            markdown_cache.close()
+            import_journal.close()
+
+    def _import_project_issues(self, jira_project, github_project_name,
+                               github_attachments_repository_name,
+                               mapping_usernames, default_assignee,
+                               concurrency, markdown_cache, import_journal):
+        print(
+            "Importing issues from JIRA project {} to Github repository named '{}'".format(
+                jira_project.project_key, github_project_name))
+
         github_comet = buhtig.GithubComet(jira_project, self.github,
                                           github_organization_name,
                                           github_project_name,
-                                          github_authentication_token)
-
-        # delete default labels created by Github
-        github_comet.delete_labels()
-        # create custom default labels
-        github_comet.create_labels({
-            # labels related to issue priority
-            'priority:blocker': 'ff6666',
-            'priority:critical': 'ff8080',
-            'priority:major': 'ff9999',
-            'priority:minor': 'ffb2b2',
-            'priority:trivial': 'ffcccc',
-            # labels related to issue resolution
-            'resolution:cannot-reproduce': 'bfe5bf',
-            'resolution:duplicate': 'bfe5bf',
-            'resolution:fixed': 'bfe5bf',
-            'resolution:incomplete': 'bfe5bf',
-            'resolution:invalid': 'bfe5bf',
-            'resolution:wont-fix': 'bfe5bf',
-            # labels related to issue type
-            'type:bug': 'c7def8',
-            'type:improvement': 'c7def8',
-            'type:new-feature': 'c7def8',
-            'type:story': 'c7def8',
-            'type:story-item': 'c7def8',
-            'type:task': 'c7def8',
-            'type:task-related-bug': 'c7def8'
-        })
-        github_comet.create_milestones()
+                                          github_authentication_token,
+                                          markdown_cache, import_journal,
+                                          self.rate_limiter,
+                                          github_cache=self.github_cache)
+
+        # projects mapped to the same repository set it up one at a time,
+        # whereas their issues are imported concurrently
+        with self._get_repository_lock(github_project_name):
+            # replace default labels created by Github with custom ones
+            github_comet.sync_labels(ISSUE_LABELS)
+            github_comet.create_milestones()
+
         github_comet.import_issues(github_attachments_repository_name,
-                                   mapping_usernames, default_assignee)
+                                   mapping_usernames, default_assignee,
+                                   concurrency)
 
     @staticmethod
     def transform_bool(v):
@@ -320,6 +790,86 @@ class Migration:
         return v.lower() in ("yes", "true", "t", "1")
 
 
+def expand_braces(pattern):
+    """
+    Expands shell-like braces, e.g. '*.{jar,zip}' gives ['*.jar', '*.zip']
+    """
+    match = re.search(r'{([^{}]*)}', pattern)
+
+    if match is None:
+        return [pattern]
+
+    result = []
+
+    for alternative in match.group(1).split(','):
+        result.extend(expand_braces(
+            pattern[:match.start()] + alternative + pattern[match.end():]))
+
+    return result
+
+
+def prepare_repository(ow2_repo_name, filter_entry, working_dir,
+                       pushed_source_tips=None):
+    """
+    Runs the stages preceding the import of a repository to Github
+
+    :param filter_entry: BFG filter to apply or None if the repository
+                         has not to be pruned
+    :param pushed_source_tips: ref tips of the source repository when it
+                               was last imported, if known
+    :return: a tuple made of the ref tips of the source repository and of
+             the prepared repository, or None if a stage has failed. The
+             latter is None when the source repository has not changed
+             since its last import
+    """
+    repo_dir = working_dir + os.sep + ow2_repo_name
+
+    if not Migration.clone_repository(ow2_repo_name, working_dir):
+        return None
+
+    source_tips = Migration.get_ref_tips(repo_dir)
+
+    if source_tips == pushed_source_tips:
+        print("Repository '{}' has not changed since its last import".format(
+            ow2_repo_name))
+        return (source_tips, None)
+
+    if not Migration.gc_repository(ow2_repo_name, working_dir) or not (
+                    filter_entry is None or
+                    Migration.prune_repository(filter_entry, working_dir)):
+        return None
+
+    return (source_tips, Migration.get_ref_tips(repo_dir))
+
+
+class SyncState:
+    """
+    Ref tips of repositories recorded after each stage of their migration,
+    persisted in a JSON file
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+        else:
+            self.data = {}
+
+    def get(self, repo_name, stage):
+        return self.data.get(repo_name, {}).get(stage)
+
+    def set(self, repo_name, stage, tips):
+        self.data.setdefault(repo_name, {})[stage] = tips
+
+        # the file is replaced at once to never leave a truncated state
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+
+        os.replace(self.path + '.tmp', self.path)
+
+
 class FilterMappingEntry:
     def __init__(self, ow2_repo_name, bfg_filter):
         self.ow2_repo_name = ow2_repo_name
@@ -351,6 +901,8 @@ def main():
         migration.delete_repositories,
         migration.edit_repositories,
         migration.import_repositories,
+        migration.migrate_repositories,
+        migration.rate_limit,
         migration.import_attachments,
         migration.import_issues,
         migration.import_issues_for_project
@@ -362,10 +914,40 @@ def main():
         migration.prune_repositories
     ]
 
-    parser = argparse.ArgumentParser()
+    jira_subcommands = [
+        migration.export_snapshot
+    ]
+
+    # global options are parsed before subcommands are dispatched
+    options_parser = argparse.ArgumentParser(add_help=False)
+    options_parser.add_argument(
+        '--profile', metavar='FILE',
+        help='profile the subcommand with cProfile and write stats to FILE')
+    options_parser.add_argument(
+        '--report', metavar='FILE', default='run-report.json',
+        help='JSON file where timings of the run are written '
+             '(default: %(default)s)')
+    (options, argv) = options_parser.parse_known_args()
+
+    parser = argparse.ArgumentParser(parents=[options_parser])
     argh.add_commands(parser, github_subcommands, namespace='github')
+    argh.add_commands(parser, jira_subcommands, namespace='jira')
     argh.add_commands(parser, ow2_subcommands, namespace='ow2')
-    argh.dispatch(parser)
+
+    def interrupt(signum, frame):
+        # commands run in their own session and do not get the signal,
+        # they are killed before executors wait for their workers
+        utility.runner.cancel()
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGINT, interrupt)
+
+    try:
+        with instrumentation.profile(options.profile):
+            argh.dispatch(parser, argv=argv)
+    finally:
+        instrumentation.recorder.report()
+        instrumentation.recorder.write_report(options.report, ' '.join(argv))
 
 
 if __name__ == "__main__":
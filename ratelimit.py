@@ -0,0 +1,207 @@
+import threading
+import time
+
+import requests
+from github import GithubException
+
+import instrumentation
+
+# delay in seconds waited after a secondary rate limit when Github gives none
+SECONDARY_RATE_LIMIT_DELAY = 60
+
+
+class RateLimiter:
+    """
+    Request scheduler shared by the clients of the Github API. It acts as a
+    token bucket refilled from the X-RateLimit-* headers returned by Github:
+    requests are paced so that the remaining quota is spread until its
+    reset, and are suspended when Github asks to back off with Retry-After.
+
+    Requests may be sent on behalf of clients, e.g. projects imported
+    concurrently: when several clients are waiting, the next slot goes to
+    the one which has been granted the fewest requests, so that each client
+    gets a fair share of the quota.
+    """
+
+    def __init__(self, reserve=50, max_penalty=64):
+        """
+        :param reserve: number of requests kept for other clients sharing
+                        the same token
+        :param max_penalty: upper bound for the factor applied to the delay
+                            between two requests after abuse detections
+        """
+        self.reserve = reserve
+        self.max_penalty = max_penalty
+
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.requests = 0
+        self.started = time.time()
+
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._next_slot = 0
+        self._blocked_until = 0
+        self._penalty = 1
+
+        # client -> number of requests granted, number of requests waiting
+        self._granted = {}
+        self._waiting = {}
+
+    @instrumentation.instrumented('github.rate_limit_wait')
+    def acquire(self, client=None):
+        """
+        Blocks until the next request can be sent
+
+        :param client: identifier of the client sending the request
+        """
+        with self._condition:
+            self._enqueue(client)
+
+            while True:
+                now = time.time()
+                slot = max(now, self._next_slot, self._blocked_until)
+
+                if slot <= now and self._is_next(client):
+                    break
+
+                self._condition.wait(slot - now if slot > now else None)
+
+            self._waiting[client] -= 1
+            self._granted[client] += 1
+
+            self._next_slot = now + self._get_interval(now)
+            self.requests += 1
+
+            if self.remaining is not None:
+                self.remaining -= 1
+
+            self._condition.notify_all()
+
+    def _enqueue(self, client):
+        if self._waiting.get(client, 0) == 0:
+            # a client which has been idle does not get the requests it
+            # has not sent meanwhile
+            others = [self._granted[c] for c, waiting in
+                      self._waiting.items() if waiting > 0]
+
+            self._granted[client] = max([self._granted.get(client, 0)] +
+                                        ([min(others)] if others else []))
+
+        self._waiting[client] = self._waiting.get(client, 0) + 1
+
+    def _is_next(self, client):
+        return all(self._granted[client] <= self._granted[c]
+                   for c, waiting in self._waiting.items() if waiting > 0)
+
+    def update(self, headers, status_code=None, message=None):
+        """
+        Updates the quota from the headers of a response
+
+        :param message: error message of the response, if known, which
+                        tells secondary rate limits from permission errors
+        :return: True if the request has been rejected because of rate
+                 limiting and has to be sent again
+        """
+        # PyGithub gives headers with lowercased names
+        headers = requests.structures.CaseInsensitiveDict(headers or {})
+
+        with self._condition:
+            if 'X-RateLimit-Remaining' in headers:
+                self.limit = int(headers.get('X-RateLimit-Limit', 0))
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+                self.reset = int(headers['X-RateLimit-Reset'])
+
+            if status_code not in (403, 429):
+                self._penalty = max(1, self._penalty // 2)
+                return False
+
+            if 'Retry-After' in headers:
+                # abuse detection, requests are slowed down from now on
+                self._penalty = min(self._penalty * 2, self.max_penalty)
+                self._block(time.time() + int(headers['Retry-After']))
+                return True
+
+            if self.remaining == 0:
+                self._block(self.reset + 1)
+                return True
+
+            if status_code == 403 and message is not None and not any(
+                    word in message.lower() for word in ('rate limit',
+                                                         'abuse')):
+                return False
+
+            # secondary rate limit without any delay given, Github asks to
+            # wait for at least one minute
+            self._penalty = min(self._penalty * 2, self.max_penalty)
+            self._block(time.time() + SECONDARY_RATE_LIMIT_DELAY)
+            return True
+
+    def call(self, github, action, client=None):
+        """
+        Runs an action relying on PyGithub and updates the quota from the
+        last response received by the given Github instance
+        """
+        while True:
+            self.acquire(client)
+
+            try:
+                result = action()
+            except GithubException as e:
+                headers = getattr(e, 'headers', None) or {}
+                data = e.data if isinstance(e.data, dict) else {}
+
+                if e.status in (403, 429) and (
+                            self.update(headers, e.status,
+                                        str(data.get('message', ''))) or
+                            self._update_from(github)):
+                    continue
+
+                raise
+
+            self._update_from(github)
+
+            return result
+
+    def _update_from(self, github):
+        (remaining, limit) = github.rate_limiting
+
+        if remaining < 0:
+            # no request has been answered yet
+            return False
+
+        return self.update({'X-RateLimit-Limit': limit,
+                            'X-RateLimit-Remaining': remaining,
+                            'X-RateLimit-Reset': github.rate_limiting_resettime},
+                           403 if remaining == 0 else None)
+
+    def _get_interval(self, now):
+        if self.remaining is None or self.reset is None:
+            return 0
+
+        available = self.remaining - self.reserve
+        interval = (self.reset - now) / available if available > 0 \
+            else max(0, self.reset - now)
+
+        return max(0, interval) * self._penalty
+
+    def _block(self, until):
+        self._blocked_until = max(self._blocked_until, until)
+        self._condition.notify_all()
+
+        print("Github rate limit reached, requests suspended for {} seconds".format(
+            round(self._blocked_until - time.time())))
+
+    def get_throughput(self):
+        """
+        :return: the number of requests sent per second since creation
+        """
+        return self.requests / max(1, time.time() - self.started)
+
+    def report(self):
+        print("Github quota: {}/{} remaining, reset at {}, {:.2f} requests/s".format(
+            self.remaining, self.limit,
+            time.strftime('%H:%M:%S', time.localtime(self.reset))
+            if self.reset is not None else None,
+            self.get_throughput()))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import gzip
+import json
+import os
+import types
+
+from arij import AttachmentRecord, CommentRecord, IssueRecord, JiraProject
+
+FORMAT_VERSION = 2
+
+
+def get_snapshot_path(snapshot_dir, project_key):
+    return os.path.join(snapshot_dir, project_key + '.jsonl.gz')
+
+
+def export_project(jira_project, path):
+    """
+    Streams the issues of a JIRA project to a compressed JSON lines file.
+    The first line describes the project and its versions, each following
+    line is an issue record, with all its comments and attachment metadata,
+    serialized as a JSON array
+
+    :return: the number of issues exported
+    """
+    versions = [version.raw for version in
+                jira_project.get_project_versions()]
+    count = 0
+
+    # the snapshot is only visible once complete
+    with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+        _write_line(f, {'format': FORMAT_VERSION,
+                        'jira_url': jira_project.jira_url,
+                        'project_key': jira_project.project_key,
+                        'versions': versions})
+
+        for issue in jira_project.iter_issues():
+            # comments missing from search results are fetched
+            _write_line(f, issue._replace(
+                comments=jira_project.get_issue_comments(issue)))
+            count += 1
+
+    os.replace(path + '.tmp', path)
+
+    return count
+
+
+def _write_line(f, data):
+    f.write(json.dumps(data, separators=(',', ':')))
+    f.write('\n')
+
+
+def _load(line):
+    # JSON objects get attributes, like JIRA resources
+    return json.loads(line, object_hook=lambda d: types.SimpleNamespace(**d))
+
+
+def _load_issue(line):
+    issue = IssueRecord(*json.loads(line))
+
+    return issue._replace(
+        comments=tuple(CommentRecord(*c) for c in issue.comments),
+        attachments=tuple(AttachmentRecord(*a) for a in issue.attachments))
+
+
+class SnapshotProject(JiraProject):
+    """
+    JIRA project read from a snapshot written by export_project. It offers
+    the accessors of JiraProject without sending any request to JIRA
+    """
+
+    def __init__(self, path):
+        """
+        :param path: snapshot file of the project
+        """
+        self.path = path
+
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = _load(f.readline())
+
+        if getattr(header, 'format', None) != FORMAT_VERSION:
+            raise ValueError("Unsupported snapshot format in '{}'".format(
+                path))
+
+        self.jira_url = header.jira_url
+        self.project_key = header.project_key
+        self.versions = header.versions
+
+    def get_comments(self, issue):
+        # snapshots contain all the comments of issues
+        return issue.comments
+
+    def get_project_versions(self):
+        return list(self.versions)
+
+    def iter_issues(self, fields=None, expand=None):
+        """
+        Yields the issues of the snapshot, in key order, while it is read
+        """
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            # the first line is the header
+            f.readline()
+
+            for line in f:
+                yield _load_issue(line)
+
+    def get_issue_count(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            # all lines but the header are issues
+            return sum(1 for _ in f) - 1
+
+    def get_issues(self, fields=None, expand=None):
+        return list(self.iter_issues())
+
+    def get_attachment_information(self):
+        return [(issue.key, attachment)
+                for issue in self.iter_issues()
+                for attachment in issue.attachments]
@@ -1,6 +1,12 @@
+import collections
 import os
+import signal
 import subprocess
 import sys
+import threading
+import time
+
+import instrumentation
 
 
 class UndefinedEnvironmentVariable(NameError):
@@ -18,11 +24,247 @@ def get_env_var(name):
     return value
 
 
-def execute_command(command):
-    process = subprocess.Popen(
-        command, shell=True, universal_newlines=True, stdout=subprocess.PIPE)
-    process.wait()
-    return process.returncode
+class CommandResult:
+    def __init__(self, command, returncode, output, wall_time, peak_rss):
+        """
+        :param output: standard output of the command when captured
+        :param wall_time: duration of the command in seconds
+        :param peak_rss: peak resident set size in bytes of the processes
+                         started by the command, sampled every 50 ms while
+                         they run, 0 for shorter commands
+        """
+        self.command = command
+        self.returncode = returncode
+        self.output = output
+        self.wall_time = wall_time
+        self.peak_rss = peak_rss
+
+    def __str__(self):
+        return "'{}' exited with {} in {:.1f}s, peak RSS {:.1f} MB".format(
+            self.command, self.returncode, self.wall_time,
+            self.peak_rss / (1024 * 1024))
+
+
+class CommandRunner:
+    """
+    Runs shell commands while streaming their output line by line to a log,
+    so that verbose commands never block on a full pipe. Commands can be
+    run with a timeout or cancelled, and at most max_concurrency of them
+    run at once.
+    """
+
+    def __init__(self, log=None, max_concurrency=4):
+        """
+        :param log: file-like object receiving the output of commands,
+                    standard output when None
+        """
+        self.log = log
+        self.max_concurrency = max_concurrency
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def run(self, command, timeout=None, capture=False,
+            expected_returncodes=(0,)):
+        """
+        :param timeout: delay in seconds after which the command is killed
+        :param capture: whether standard output is returned instead of
+                        being logged
+        :param expected_returncodes: exit codes which are not instrumented
+                                     as errors, e.g. 1 for commands telling
+                                     that something does not exist
+        """
+        with self._semaphore:
+            return self._run(command, timeout, capture,
+                             expected_returncodes)
+
+    def cancel(self):
+        """
+        Kills running commands and prevents new ones from starting
+        """
+        self._cancelled.set()
+
+    def _run(self, command, timeout, capture, expected_returncodes):
+        start = time.monotonic()
+
+        if self._cancelled.is_set():
+            return self._record(CommandResult(command, -signal.SIGTERM, None,
+                                              0, 0), expected_returncodes)
+
+        # a new session allows to kill the commands started by the shell,
+        # undecodable output, e.g. legacy commit messages, is replaced so
+        # that readers never stop draining pipes
+        process = subprocess.Popen(command, shell=True,
+                                   encoding='utf-8', errors='replace',
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   start_new_session=True)
+        output = []
+
+        readers = [
+            threading.Thread(target=self._stream,
+                             args=(process.stdout,
+                                   output if capture else None, '')),
+            threading.Thread(target=self._stream,
+                             args=(process.stderr, None, '! '))
+        ]
+
+        for reader in readers:
+            reader.start()
+
+        peak_rss = 0
+
+        while True:
+            # short commands return as soon as they exit
+            try:
+                process.wait(timeout=0.05)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+
+            # memory is sampled while the commands of the group are running
+            peak_rss = max(peak_rss, self._get_group_rss(process.pid))
+
+            if self._cancelled.is_set() or (
+                    timeout is not None and
+                    time.monotonic() - start > timeout):
+                self._kill(process)
+                process.wait()
+                break
+
+        for reader in readers:
+            reader.join()
+
+        return self._record(CommandResult(
+            command, process.returncode,
+            ''.join(output) if capture else None,
+            time.monotonic() - start, peak_rss), expected_returncodes)
+
+    def _stream(self, pipe, output, prefix):
+        try:
+            for line in pipe:
+                if output is not None:
+                    output.append(line)
+                    continue
+
+                try:
+                    with self._lock:
+                        log = self.log if self.log is not None \
+                            else sys.stdout
+                        log.write(prefix + line)
+                        log.flush()
+                except (OSError, ValueError):
+                    # the pipe is drained anyway so that the command never
+                    # blocks on it
+                    pass
+        finally:
+            pipe.close()
+
+    @staticmethod
+    def _get_group_rss(pgid):
+        """
+        :return: sum in bytes of the peak resident set sizes of the running
+                 processes of a process group, read from /proc
+        """
+        total = 0
+
+        for name in os.listdir('/proc'):
+            if not name.isdigit():
+                continue
+
+            try:
+                if os.getpgid(int(name)) != pgid:
+                    continue
+
+                with open('/proc/{}/status'.format(name)) as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            # sizes are given in kilobytes
+                            total += int(line.split()[1]) * 1024
+                            break
+            except OSError:
+                # the process has exited in the meantime
+                pass
+
+        return total
+
+    @staticmethod
+    def _kill(process):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _record(self, result, expected_returncodes):
+        instrumentation.recorder.record(
+            self._get_stage(result.command),
+            time.monotonic() - result.wall_time, result.wall_time,
+            result.returncode not in expected_returncodes)
+
+        return result
+
+    @staticmethod
+    def _get_stage(command):
+        """
+        :return: the name under which a command is instrumented, made of
+                 the first two words of the command run after any 'cd'
+        """
+        for part in command.split('&&'):
+            words = part.split()
+
+            if words and words[0] != 'cd':
+                return 'command.' + ' '.join(words[:2])
+
+        return 'command'
+
+
+runner = CommandRunner()
+
+
+def execute_command(command, timeout=None, expected_returncodes=(0,)):
+    result = runner.run(command, timeout,
+                        expected_returncodes=expected_returncodes)
+
+    print("Command {}".format(result))
+
+    return result.returncode
+
+
+def command_output(command, check=True, timeout=None,
+                   expected_returncodes=(0,)):
+    """
+    :param check: whether the output of a failed command has to be ignored
+    :param expected_returncodes: exit codes which are not instrumented as
+                                 errors
+    :return: the standard output of command or None if it has failed
+             and check is enabled
+    """
+    result = runner.run(command, timeout, capture=True,
+                        expected_returncodes=expected_returncodes)
+
+    if check and result.returncode != 0:
+        return None
+
+    return result.output
+
+
+def ordered_map(executor, fn, iterable, window):
+    """
+    Lazily applies fn to each item of iterable by using the given executor.
+    At most window calls are in flight at once and results are yielded
+    in the same order as items
+    """
+    pending = collections.deque()
+
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+
+        if len(pending) >= window:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
 
 
 def execute(action, success_msg, error_msg):